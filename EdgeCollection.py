@@ -0,0 +1,189 @@
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba_array
+from matplotlib.transforms import IdentityTransform
+from Arrow import Arrow
+
+# Open "->" arrowhead proportions, as fractions of the mutation scale (in points)
+HEAD_LENGTH = 0.4
+HEAD_WIDTH = 0.2
+
+
+class ArrowheadCollection(LineCollection):
+    """Open arrowheads at the end of every segment, drawn as one collection.
+
+    Heads are sized in points, so their display geometry is recomputed from the
+    current data transform on every draw and stays correct after zooming or
+    resizing.
+    """
+
+    def __init__(self, tails, tips, mutation_scale=15, **kwargs):
+        super().__init__([], transform=IdentityTransform(), **kwargs)
+        self.tails = np.asarray(tails, dtype=np.float64).reshape(-1, 2)
+        self.tips = np.asarray(tips, dtype=np.float64).reshape(-1, 2)
+        self.mutation_scale = mutation_scale
+
+    def set_positions(self, tails, tips):
+        self.tails = np.asarray(tails, dtype=np.float64).reshape(-1, 2)
+        self.tips = np.asarray(tips, dtype=np.float64).reshape(-1, 2)
+        self.stale = True
+
+    def draw(self, renderer):
+        transform = self.axes.transData
+        tails = transform.transform(self.tails)
+        tips = transform.transform(self.tips)
+
+        direction = tips - tails
+        length = np.hypot(direction[:, 0], direction[:, 1])
+        direction /= np.where(length > 0, length, 1.0)[:, None]
+        normal = np.column_stack((-direction[:, 1], direction[:, 0]))
+
+        scale = renderer.points_to_pixels(self.mutation_scale)
+        back = tips - direction * HEAD_LENGTH * scale
+        left = back + normal * HEAD_WIDTH * scale
+        right = back - normal * HEAD_WIDTH * scale
+        # One polyline per head: left barb -> tip -> right barb
+        self.set_segments(np.stack((left, tips, right), axis=1))
+        super().draw(renderer)
+
+
+class EdgeHandle:
+    """One edge of an EdgeCollection, with the parts of the Arrow interface the UI uses."""
+
+    def __init__(self, collection, index, meta):
+        self.collection = collection
+        self.index = index
+        self.meta = meta
+
+    @property
+    def posA(self):
+        return tuple(self.collection.starts[self.index])
+
+    @property
+    def posB(self):
+        return tuple(self.collection.ends[self.index])
+
+    def get_alpha(self):
+        return self.collection.alphas[self.index]
+
+    def set_alpha(self, alpha):
+        self.collection.alphas[self.index] = alpha
+        self.collection.update_style()
+
+    def set_linewidth(self, linewidth):
+        self.collection.linewidths[self.index] = linewidth
+        self.collection.update_style()
+
+    def set_positions(self, posA, posB):
+        self.collection.starts[self.index] = posA
+        self.collection.ends[self.index] = posB
+        self.collection.update_positions()
+
+
+class EdgeCollection:
+    """A graph's edges drawn as one LineCollection plus one ArrowheadCollection.
+
+    Replaces one FancyArrowPatch per edge; per-edge colour, linewidth and alpha
+    come from arrays, and `edges` gives a handle per edge for hover and click.
+    """
+
+    def __init__(self, axes, starts, ends, colors, linewidths, alphas, metas, mutation_scale=15, zorder=1):
+        self.axes = axes
+        self.starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        self.ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        self.colors = to_rgba_array(colors)
+        self.linewidths = np.asarray(linewidths, dtype=np.float64)
+        self.alphas = np.asarray(alphas, dtype=np.float64)
+        self.visible = np.ones(len(self.starts), dtype=bool)
+        self.edges = [EdgeHandle(self, index, meta) for index, meta in enumerate(metas)]
+
+        self.lines = LineCollection(self.segments(), zorder=zorder)
+        self.heads = ArrowheadCollection(self.starts, self.ends, mutation_scale=mutation_scale, zorder=zorder)
+        self.update_style()
+        axes.add_collection(self.lines, autolim=False)
+        axes.add_collection(self.heads, autolim=False)
+
+    def segments(self):
+        return np.stack((self.starts, self.ends), axis=1)
+
+    def update_positions(self):
+        self.lines.set_segments(self.segments())
+        self.heads.set_positions(self.starts, self.ends)
+
+    def update_style(self):
+        colors = self.colors.copy()
+        colors[:, 3] = np.where(self.visible, self.alphas, 0.0)
+        for collection in (self.lines, self.heads):
+            collection.set_color(colors)
+            collection.set_linewidth(self.linewidths)
+
+    def restyle(self, visible, colors=None):
+        """Show only the edges in the `visible` mask, optionally recolouring them."""
+        self.visible = np.asarray(visible, dtype=bool)
+        if colors is not None:
+            self.colors = to_rgba_array(colors)
+        self.update_style()
+
+    def segment_arrays(self):
+        """(starts, ends, visible) in data coordinates, one row per edge."""
+        return self.starts, self.ends, self.visible
+
+    def hit(self, event):
+        """The visible edge under the mouse event, or None."""
+        contains, info = self.lines.contains(event)
+        if not contains:
+            return None
+        for index in info.get("ind", ()):
+            if self.visible[index]:
+                return self.edges[index]
+        return None
+
+    def remove(self):
+        self.lines.remove()
+        self.heads.remove()
+
+
+class EdgePatches:
+    """A graph's edges as one Arrow patch each, behind the EdgeCollection interface.
+
+    Slower to draw than EdgeCollection, but pixel-identical to the original
+    FancyArrowPatch rendering; meant for small graphs.
+    """
+
+    def __init__(self, axes, starts, ends, colors, linewidths, alphas, metas, mutation_scale=15):
+        self.edges = []
+        for posA, posB, color, linewidth, alpha, meta in zip(starts, ends, colors, linewidths, alphas, metas):
+            arrow = Arrow(
+                posA=tuple(posA),
+                posB=tuple(posB),
+                arrowstyle="->",
+                linewidth=linewidth,
+                alpha=alpha,
+                color=color,
+                mutation_scale=mutation_scale
+            )
+            arrow.meta = meta
+            axes.add_patch(arrow)
+            self.edges.append(arrow)
+
+    def restyle(self, visible, colors=None):
+        for index, arrow in enumerate(self.edges):
+            arrow.set_visible(bool(visible[index]))
+            if colors is not None:
+                arrow.set_color(colors[index])
+
+    def segment_arrays(self):
+        starts = np.array([arrow.posA for arrow in self.edges], dtype=np.float64).reshape(-1, 2)
+        ends = np.array([arrow.posB for arrow in self.edges], dtype=np.float64).reshape(-1, 2)
+        visible = np.array([arrow.get_visible() for arrow in self.edges], dtype=bool)
+        return starts, ends, visible
+
+    def hit(self, event):
+        for arrow in self.edges:
+            if arrow.get_visible() and arrow.contains(event)[0]:
+                return arrow
+        return None
+
+    def remove(self):
+        for arrow in self.edges:
+            arrow.remove()
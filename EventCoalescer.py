@@ -0,0 +1,66 @@
+from PyQt5.QtCore import QObject, QTimer
+
+
+class EventCoalescer(QObject):
+    """Deliver only the latest of a burst of events, from a Qt timer.
+
+    `submit` stores its arguments and starts a single-shot timer; anything
+    submitted before the timer fires replaces the pending arguments and is
+    counted as dropped. In throttle mode (the default) the latest event is
+    delivered once per interval while input keeps coming; with
+    ``debounce=True`` every submit restarts the timer, so delivery waits until
+    the input has been quiet for one interval.
+    """
+
+    def __init__(self, callback, interval_ms=16, debounce=False, parent=None):
+        super().__init__(parent)
+        self.callback = callback
+        self.debounce = debounce
+        self.pending = None
+        self.submitted = 0
+        self.delivered = 0
+        self.dropped = 0
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.flush)
+
+    @property
+    def interval(self):
+        return self.timer.interval()
+
+    def set_interval(self, interval_ms):
+        self.timer.setInterval(interval_ms)
+
+    def submit(self, *args):
+        self.submitted += 1
+        if self.pending is not None:
+            self.dropped += 1
+        self.pending = args
+        if self.debounce or not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        """Deliver the pending event now, if there is one."""
+        self.timer.stop()
+        if self.pending is None:
+            return
+        args, self.pending = self.pending, None
+        self.delivered += 1
+        self.callback(*args)
+
+    def cancel(self):
+        """Discard the pending event without delivering it."""
+        self.timer.stop()
+        if self.pending is not None:
+            self.dropped += 1
+            self.pending = None
+
+    def stats(self):
+        return {
+            "interval_ms": self.interval,
+            "submitted": self.submitted,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
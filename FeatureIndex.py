@@ -0,0 +1,179 @@
+"""Precomputed on-disk index of graph features for a whole cohort.
+
+Every subject x graph type is evaluated once and stored in a compressed
+.npz next to the dataset. Graphs read their features from it instead of
+running bct, as long as the index was built from identical spectra: each
+subject's spectrum is checked on its first lookup, so a subject appended
+to the dataset later only needs its own features computed (`extend`).
+
+Usage: python FeatureIndex.py [--output Datasets/features.npz] [--workers N]
+"""
+import argparse
+import hashlib
+import os
+import numpy as np
+
+FEATURE_INDEX_VERSION = 2
+FEATURE_INDEX_NAME = 'features.npz'
+
+LOCAL_FEATURES = ["undirected_strengths", "undirected_betweenness_centralities",
+                  "undirected_clustering_coefs", "local_efficiency"]
+GLOBAL_FEATURES = ["density", "global_efficiency", "char_path_length", "undirected_transitivity_wu",
+                   "average_local_efficiency", "average_betweenness_centrality"]
+
+
+def dataset_checksum(dataset):
+    """Digest of what every subject's features depend on: the shift axis and metabolite table."""
+    import WeightedVisibilityGraph
+
+    digest = hashlib.sha256(f"v{FEATURE_INDEX_VERSION}".encode())
+    digest.update(np.ascontiguousarray(dataset.chemical_shifts_array).tobytes())
+    digest.update(repr(WeightedVisibilityGraph.metabolite_symbols).encode())
+    digest.update(WeightedVisibilityGraph.metabolite_shift_values.tobytes())
+    return digest.hexdigest()
+
+
+def spectrum_checksum(dataset, subject_id):
+    return hashlib.sha256(np.ascontiguousarray(dataset.spectrum_store.column(subject_id)).tobytes()).hexdigest()
+
+
+def default_index_path(dataset):
+    return os.path.join(os.path.dirname(dataset.spectra_path) or '.', FEATURE_INDEX_NAME)
+
+
+class FeatureIndex:
+    """Features of every (subject, graph type), local ones in metabolite_symbols order."""
+
+    def __init__(self, subjects, graph_types, symbols, features, checksum, spectrum_checksums, dataset=None):
+        self.subjects = np.asarray(subjects)
+        self.graph_types = list(graph_types)
+        self.symbols = list(symbols)
+        self.features = features
+        self.checksum = checksum
+        self.spectrum_checksums = list(spectrum_checksums)
+        # Spectra are compared with the checksums on first lookup, when a dataset is attached
+        self.dataset = dataset
+        self._verified = {}
+        self._subject_positions = {int(subject): i for i, subject in enumerate(self.subjects)}
+        self._type_positions = {graph_type.lower(): i for i, graph_type in enumerate(self.graph_types)}
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as archive:
+            if int(archive["version"]) != FEATURE_INDEX_VERSION:
+                return None
+            features = {name: archive[name] for name in LOCAL_FEATURES + GLOBAL_FEATURES}
+            return cls(archive["subjects"], archive["graph_types"].tolist(), archive["symbols"].tolist(),
+                       features, str(archive["checksum"]), archive["spectrum_checksums"].tolist())
+
+    @classmethod
+    def open(cls, dataset, path=None):
+        """The index for this dataset, or None when missing or built from other spectra."""
+        path = path or default_index_path(dataset)
+        if not os.path.exists(path):
+            return None
+        try:
+            index = cls.load(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        if index is None or index.checksum != dataset_checksum(dataset):
+            return None
+        index.dataset = dataset
+        return index
+
+    def save(self, path):
+        np.savez_compressed(path, version=FEATURE_INDEX_VERSION, checksum=self.checksum,
+                            spectrum_checksums=np.array(self.spectrum_checksums),
+                            subjects=self.subjects, graph_types=np.array(self.graph_types),
+                            symbols=np.array(self.symbols), **self.features)
+
+    def lookup(self, subject_id, graph_type):
+        """Feature values for one graph as {attribute: value}, or None if not indexed."""
+        subject = self._subject_positions.get(int(subject_id))
+        graph = self._type_positions.get(graph_type.lower())
+        if subject is None or graph is None or not self.is_current(subject):
+            return None
+        return {name: values[graph, subject] for name, values in self.features.items()}
+
+    def is_current(self, position):
+        """Whether the indexed subject at `position` still has the spectrum it was built from."""
+        if self.dataset is None:
+            return True
+        if position not in self._verified:
+            subject = int(self.subjects[position])
+            self._verified[position] = (subject < self.dataset.subject_count and
+                                        spectrum_checksum(self.dataset, subject) == self.spectrum_checksums[position])
+        return self._verified[position]
+
+    def extend(self, dataset, subject_ids, workers=None):
+        """Compute and add the features of `subject_ids` only, replacing any stale entries."""
+        subject_ids = [int(subject) for subject in subject_ids]
+        features = compute_features(dataset, subject_ids, self.graph_types, workers)
+        for column, subject in enumerate(subject_ids):
+            position = self._subject_positions.get(subject)
+            if position is None:
+                position = len(self.subjects)
+                self.subjects = np.append(self.subjects, subject)
+                self.spectrum_checksums.append(None)
+                for name, values in self.features.items():
+                    self.features[name] = np.concatenate((values, features[name][:, column:column + 1]), axis=1)
+                self._subject_positions[subject] = position
+            else:
+                for name, values in self.features.items():
+                    values[:, position] = features[name][:, column]
+            self.spectrum_checksums[position] = spectrum_checksum(dataset, subject)
+            self._verified[position] = True
+
+
+def compute_features(dataset, subject_ids, graph_types, workers=None):
+    """Evaluate every subject x graph type across a process pool, as (graph types, subjects, ...) arrays."""
+    import MRSightBatch
+    import WeightedVisibilityGraph
+
+    tasks = [(subject, graph_type, None) for graph_type in graph_types for subject in subject_ids]
+    rows = MRSightBatch.compute_rows(tasks, dataset.spectra_path, dataset.chemical_shifts_path, workers)
+
+    symbols = WeightedVisibilityGraph.metabolite_symbols
+    shape = (len(graph_types), len(subject_ids))
+    features = {name: np.zeros(shape) for name in GLOBAL_FEATURES}
+    features.update({name: np.zeros(shape + (len(symbols),)) for name in LOCAL_FEATURES})
+    local_columns = {attribute: column for column, attribute in MRSightBatch.LOCAL_FEATURES.items()}
+    for task, row in enumerate(rows):
+        position = divmod(task, len(subject_ids))
+        for name in GLOBAL_FEATURES:
+            features[name][position] = row[name]
+        for name in LOCAL_FEATURES:
+            features[name][position] = [row[f"{local_columns[name]}_{symbol}"] for symbol in symbols]
+    return features
+
+
+def build(dataset, graph_types, workers=None):
+    """Evaluate every subject x graph type and collect the index."""
+    import WeightedVisibilityGraph
+
+    subjects = np.arange(dataset.subject_count)
+    features = compute_features(dataset, [int(subject) for subject in subjects], graph_types, workers)
+    return FeatureIndex(subjects, graph_types, WeightedVisibilityGraph.metabolite_symbols, features,
+                        dataset_checksum(dataset), [spectrum_checksum(dataset, subject) for subject in subjects], dataset)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute the MRSight feature index.")
+    parser.add_argument("--spectra", default="Datasets/spectra.csv")
+    parser.add_argument("--chemical-shifts", default="Datasets/chemical_shifts.csv")
+    parser.add_argument("--output", help="index file (default: features.npz next to the spectra)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    import MRSightBatch
+    import WeightedVisibilityGraph
+
+    dataset = WeightedVisibilityGraph.use_dataset(args.spectra, args.chemical_shifts)
+    index = build(dataset, MRSightBatch.METABOLITE_GRAPH_TYPES, args.workers)
+    output = args.output or default_index_path(dataset)
+    index.save(output)
+    print(f"Indexed {len(index.subjects)} subjects x {len(index.graph_types)} graph types in {output}")
+
+
+if __name__ == "__main__":
+    main()
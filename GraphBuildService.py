@@ -0,0 +1,125 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class GraphBuildSignals(QObject):
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+
+
+class GraphBuildTask(QRunnable):
+    """Build one graph on a pool thread and report back through Qt signals."""
+
+    def __init__(self, request_id, service, subject_id, graph_type):
+        super().__init__()
+        self.request_id = request_id
+        self.service = service
+        self.subject_id = subject_id
+        self.graph_type = graph_type
+        # Created on the GUI thread, so the emits below are queued to it
+        self.signals = GraphBuildSignals()
+
+    def run(self):
+        if self.service.is_superseded(self.request_id):
+            # Still report back, so the service can let go of this task
+            self.signals.finished.emit(self.request_id, None)
+            return
+        try:
+            graph = self.service.graph_cache.build(self.subject_id, self.graph_type)
+        except Exception as error:
+            self.signals.failed.emit(self.request_id, f"{type(error).__name__}: {error}")
+        else:
+            self.signals.finished.emit(self.request_id, graph)
+
+
+class GraphBuildService(QObject):
+    """Builds graphs for the UI off the GUI thread, one lane per role.
+
+    Each role ("primary", "comparison") only cares about its latest request:
+    a new request takes the previous one off the queue if it has not started,
+    and the result of a superseded build that was already running is dropped.
+    Cached graphs are delivered immediately, and the cache is only read and
+    written on the GUI thread.
+    """
+
+    built = pyqtSignal(str, object)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, graph_cache, max_threads=2, parent=None):
+        super().__init__(parent)
+        self.graph_cache = graph_cache
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.next_request_id = 0
+        self.latest = {}
+        self.roles = {}
+        # Every started task stays referenced here until it reports back
+        self.tasks = {}
+        self.cancelled = 0
+
+    def request(self, role, subject_id, graph_type):
+        """Ask for the graph of `role`, superseding any earlier request for that role."""
+        self.cancel(role)
+        graph = self.graph_cache.peek(subject_id, graph_type)
+        if graph is not None:
+            self.built.emit(role, graph)
+            return
+
+        self.graph_cache.misses += 1
+        self.next_request_id += 1
+        request_id = self.next_request_id
+        task = GraphBuildTask(request_id, self, subject_id, graph_type)
+        task.setAutoDelete(False)
+        task.signals.finished.connect(self.on_finished)
+        task.signals.failed.connect(self.on_failed)
+        self.latest[role] = request_id
+        self.roles[request_id] = role
+        self.tasks[request_id] = task
+        self.pool.start(task)
+
+    def cancel(self, role):
+        """Forget the pending request for `role`, dequeuing it if it has not started."""
+        request_id = self.latest.pop(role, None)
+        if request_id is None:
+            return
+        self.cancelled += 1
+        del self.roles[request_id]
+        if self.pool.tryTake(self.tasks[request_id]):
+            del self.tasks[request_id]
+
+    def is_superseded(self, request_id):
+        return request_id not in self.roles
+
+    def is_busy(self, role=None):
+        return role in self.latest if role is not None else bool(self.latest)
+
+    def on_finished(self, request_id, graph):
+        task = self.tasks.pop(request_id)
+        if graph is not None:
+            # Superseded builds are still worth keeping for the next switch back
+            self.graph_cache.put(graph, task.subject_id, task.graph_type)
+        role = self.roles.pop(request_id, None)
+        if role is None:
+            return
+        del self.latest[role]
+        self.built.emit(role, graph)
+
+    def on_failed(self, request_id, message):
+        self.tasks.pop(request_id)
+        role = self.roles.pop(request_id, None)
+        if role is None:
+            return
+        del self.latest[role]
+        self.failed.emit(role, message)
+
+    def stats(self):
+        return {
+            "requested": self.next_request_id,
+            "pending": len(self.latest),
+            "running": self.pool.activeThreadCount(),
+            "cancelled": self.cancelled,
+            "max_threads": self.pool.maxThreadCount(),
+        }
+
+    def wait(self, msecs=-1):
+        """Block until running builds finish; results still arrive through the event loop."""
+        return self.pool.waitForDone(msecs)
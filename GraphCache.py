@@ -0,0 +1,70 @@
+from collections import OrderedDict
+import WeightedVisibilityGraph
+
+
+class GraphCache:
+    """LRU cache of built Graphs keyed by (subject, graph type, metabolite set).
+
+    Cached graphs are shared, so callers must treat them as read-only and ask
+    the cache for another graph instead of calling change_subject or
+    change_graph_type on one.
+    """
+
+    def __init__(self, maxsize=64, dataset=None):
+        self.maxsize = maxsize
+        self.dataset = dataset
+        self.hits = 0
+        self.misses = 0
+        self._graphs = OrderedDict()
+
+    def __len__(self):
+        return len(self._graphs)
+
+    def key(self, subject_id, graph_type="Complete Metabolite Graph", metabolites=None):
+        dataset = self.dataset if self.dataset is not None else WeightedVisibilityGraph.get_dataset()
+        return (dataset, subject_id, graph_type, None if metabolites is None else frozenset(metabolites))
+
+    def get(self, subject_id, graph_type="Complete Metabolite Graph", metabolites=None):
+        graph = self.peek(subject_id, graph_type, metabolites)
+        if graph is not None:
+            return graph
+
+        self.misses += 1
+        graph = self.build(subject_id, graph_type, metabolites)
+        self.put(graph, subject_id, graph_type, metabolites)
+        return graph
+
+    def peek(self, subject_id, graph_type="Complete Metabolite Graph", metabolites=None):
+        """The cached graph, or None without building it."""
+        key = self.key(subject_id, graph_type, metabolites)
+        graph = self._graphs.get(key)
+        if graph is not None:
+            self.hits += 1
+            self._graphs.move_to_end(key)
+        return graph
+
+    def build(self, subject_id, graph_type="Complete Metabolite Graph", metabolites=None):
+        """Build a graph without touching the cache; safe to call from a worker thread."""
+        dataset = self.key(subject_id, graph_type, metabolites)[0]
+        return WeightedVisibilityGraph.Graph(subject_id, graph_type, dataset=dataset, metabolites=metabolites)
+
+    def put(self, graph, subject_id, graph_type="Complete Metabolite Graph", metabolites=None):
+        if self.maxsize > 0:
+            self._graphs[self.key(subject_id, graph_type, metabolites)] = graph
+            self.evict()
+
+    def evict(self):
+        while len(self._graphs) > self.maxsize:
+            self._graphs.popitem(last=False)
+
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        self.evict()
+
+    def clear(self):
+        self._graphs.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {"size": len(self._graphs), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
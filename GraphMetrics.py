@@ -0,0 +1,248 @@
+"""Vectorised replacements for the bct metrics computed on every Graph.
+
+Every function accepts one (n, n) connection matrix or a stack of them with
+any leading batch shape, and reproduces the corresponding bct call on the
+matrix Graph passes it: strengths_und, betweenness_wei, clustering_coef_wd,
+efficiency_wei (global and local), density_und, charpath and transitivity_wu.
+
+The path-based metrics share one search, `label_setting_distances`, run for
+every source node (and, for local efficiency, every neighbourhood) at once.
+It is the label-setting (Dijkstra) search bct runs, not Floyd-Warshall: the
+ratio weights can be negative, and on such matrices bct's results are those
+of the label-setting order rather than true shortest paths.
+"""
+import numpy as np
+
+METRIC_NAMES = (
+    "undirected_strengths",
+    "undirected_betweenness_centralities",
+    "undirected_clustering_coefs",
+    "local_efficiency",
+    "density",
+    "global_efficiency",
+    "char_path_length",
+    "undirected_transitivity_wu",
+)
+
+
+def cuberoot(x):
+    return np.sign(x) * np.abs(x) ** (1 / 3)
+
+
+def invert(W):
+    """1 / W on the edges, 0 elsewhere: connection weights to connection lengths."""
+    with np.errstate(divide="ignore"):
+        return np.where(W != 0, 1.0 / np.where(W != 0, W, 1.0), 0.0)
+
+
+def diagonal(X):
+    return np.diagonal(X, axis1=-2, axis2=-1)
+
+
+def label_setting_distances(lengths, paths=False):
+    """Distances from every source over (..., n, n) length matrices; 0 means no edge.
+
+    Returns D with D[..., s, t] the distance from s to t. With `paths`, also
+    returns the shortest-path counts, the predecessor masks P[..., s, w, v]
+    and the order in which each search made nodes permanent, as used by
+    Brandes' betweenness accumulation.
+    """
+    lengths = np.asarray(lengths, dtype=np.float64)
+    batch_shape, n = lengths.shape[:-2], lengths.shape[-1]
+    lengths = lengths.reshape(-1, n, n)
+    edges = lengths != 0
+
+    # One search per (matrix, source), flattened to k = matrix * n + source
+    count = len(lengths) * n
+    searches = np.arange(count)
+    matrix = searches // n
+    source = searches % n
+
+    D = np.full((count, n), np.inf)
+    D[searches, source] = 0.0
+    temporary = np.ones((count, n), dtype=bool)
+    V = np.zeros((count, n), dtype=bool)
+    V[searches, source] = True
+    if paths:
+        NP = np.zeros((count, n))
+        NP[searches, source] = 1.0
+        P = np.zeros((count, n, n), dtype=bool)
+        rank = np.full((count, n), -1)
+        made_permanent = np.zeros(count, dtype=np.intp)
+
+    # Searches still running, with V their nodes at the current minimum distance
+    active = searches
+    while len(active):
+        V_active = V[active]
+        temporary[active] &= ~V_active
+        # Nodes tied at the minimum distance are relaxed one by one, in index order
+        if np.count_nonzero(V_active, axis=1).max() == 1:
+            members = [(active, np.argmax(V_active, axis=1))]
+        else:
+            position = np.cumsum(V_active, axis=1)
+            members = []
+            for member in range(1, position[:, -1].max() + 1):
+                selected = V_active & (position == member)
+                has_member = selected.any(axis=1)
+                members.append((active[has_member], np.argmax(selected[has_member], axis=1)))
+
+        for rows, v in members:
+            if paths:
+                rank[rows, v] = made_permanent[rows]
+                made_permanent[rows] += 1
+
+            relax = edges[matrix[rows], v] & temporary[rows]
+            candidate = D[rows, v][:, None] + lengths[matrix[rows], v]
+            current = D[rows]
+            shorter = relax & (candidate < current)
+            if paths:
+                equal = relax & (candidate == current)
+                source_paths = NP[rows, v][:, None]
+                NP[rows] = np.where(shorter, source_paths, NP[rows] + np.where(equal, source_paths, 0.0))
+                predecessors = P[rows]
+                predecessors[shorter] = False
+                predecessors[np.arange(len(rows))[:, None], np.arange(n), v[:, None]] |= shorter | equal
+                P[rows] = predecessors
+            D[rows] = np.where(shorter, candidate, current)
+
+        distances, still_temporary = D[active], temporary[active]
+        nearest = np.where(still_temporary, distances, np.inf).min(axis=1)
+        running = np.isfinite(nearest)
+        active = active[running]
+        V[active] = still_temporary[running] & (distances[running] == nearest[running, None])
+
+    D = D.reshape(*batch_shape, n, n)
+    if not paths:
+        return D
+    return (D, NP.reshape(*batch_shape, n, n), P.reshape(*batch_shape, n, n, n),
+            rank.reshape(*batch_shape, n, n))
+
+
+def inverse_distances(lengths):
+    """bct's distance_inv_wei: 1 / distance off the diagonal, 0 when unreachable."""
+    D = label_setting_distances(lengths)
+    n = D.shape[-1]
+    off_diagonal = ~np.eye(n, dtype=bool)
+    with np.errstate(divide="ignore"):
+        return np.where(off_diagonal & np.isfinite(D), 1.0 / np.where(off_diagonal, D, 1.0), 0.0)
+
+
+def betweenness(lengths):
+    """bct.betweenness_wei: Brandes' accumulation over every source's search."""
+    lengths = np.asarray(lengths, dtype=np.float64)
+    batch_shape, n = lengths.shape[:-2], lengths.shape[-1]
+    _, NP, P, rank = label_setting_distances(lengths.reshape(-1, n, n), paths=True)
+    NP, P, rank = NP.reshape(-1, n), P.reshape(-1, n, n), rank.reshape(-1, n)
+
+    searches = np.arange(len(rank))
+    # Latest permanent first; the source (rank 0) and unreachable nodes (-1) add nothing
+    order = np.argsort(-rank, axis=1, kind="stable")
+    DP = np.zeros_like(NP)
+    BC = np.zeros_like(NP)
+    for step in range(n - 1):
+        w = order[:, step]
+        valid = rank[searches, w] > 0
+        BC[searches, w] += np.where(valid, DP[searches, w], 0.0)
+        scale = np.where(valid, (1 + DP[searches, w]) / np.where(valid, NP[searches, w], 1.0), 0.0)
+        DP += P[searches, w] * NP * scale[:, None]
+
+    return BC.reshape(*batch_shape, n, n).sum(axis=-2)
+
+
+def strengths(W):
+    return np.sum(W, axis=-2)
+
+
+def density(W):
+    n = W.shape[-1]
+    edges = np.count_nonzero(np.triu(W), axis=(-2, -1))
+    return edges / ((n * n - n) / 2)
+
+
+def clustering_coefs(W):
+    A = (W != 0).astype(np.float64)
+    S = cuberoot(W) + cuberoot(np.swapaxes(W, -1, -2))
+    K = np.sum(A + np.swapaxes(A, -1, -2), axis=-1)
+    cycles = diagonal(S @ S @ S) / 2
+    K = np.where(cycles == 0, np.inf, K)
+    possible = K * (K - 1) - 2 * diagonal(A @ A)
+    return cycles / possible
+
+
+def transitivity(W):
+    K = np.sum(W != 0, axis=-1)
+    ws = cuberoot(W)
+    cycles = diagonal(ws @ ws @ ws)
+    return np.sum(cycles, axis=-1) / np.sum(K * (K - 1), axis=-1)
+
+
+def char_path_length(W):
+    """bct.charpath(W)[0]: Graph passes the connection matrix itself, so this is its off-diagonal mean."""
+    n = W.shape[-1]
+    return np.mean(W[..., ~np.eye(n, dtype=bool)], axis=-1)
+
+
+def global_efficiency(W):
+    n = W.shape[-1]
+    return np.sum(inverse_distances(invert(W)), axis=(-2, -1)) / (n * n - n)
+
+
+def local_efficiency(W):
+    """bct.efficiency_wei(W, local=True), with all n neighbourhood searches in one batch."""
+    A = (W != 0)
+    WT = np.swapaxes(W, -1, -2)
+    neighbours = A | np.swapaxes(A, -1, -2)
+
+    # Neighbourhood u keeps only the edges between u's neighbours: (..., u, n, n)
+    inside = neighbours[..., :, :, None] & neighbours[..., :, None, :]
+    lengths = np.where(inside, cuberoot(invert(W))[..., None, :, :], 0.0)
+    e = inverse_distances(lengths)
+    se = e + np.swapaxes(e, -1, -2)
+
+    sw = cuberoot(W) + cuberoot(WT)
+    numerator = np.einsum("...ui,...uj,...uij->...u", sw, sw, se) / 2
+    sa = A.astype(np.float64) + np.swapaxes(A, -1, -2)
+    denominator = np.sum(sa, axis=-1) ** 2 - np.sum(sa * sa, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(numerator != 0, numerator / np.where(numerator != 0, denominator, 1.0), 0.0)
+
+
+def average_local_efficiency(W):
+    return np.mean(local_efficiency(W), axis=-1)
+
+
+def average_betweenness_centrality(W):
+    return np.mean(betweenness(W), axis=-1)
+
+
+# One value per graph; the averages cost as much as their local metric
+GLOBAL_METRICS = {
+    "density": density,
+    "global_efficiency": global_efficiency,
+    "char_path_length": char_path_length,
+    "undirected_transitivity_wu": transitivity,
+    "average_local_efficiency": average_local_efficiency,
+    "average_betweenness_centrality": average_betweenness_centrality,
+}
+
+
+def global_metrics(W, names=None):
+    """Only the named global metrics (all by default), skipping the cost of the others."""
+    W = np.asarray(W, dtype=np.float64)
+    return {name: GLOBAL_METRICS[name](W) for name in (names or GLOBAL_METRICS)}
+
+
+def graph_metrics(W):
+    """Every Graph feature of one connection matrix or a stack of them, keyed by Graph attribute name."""
+    W = np.asarray(W, dtype=np.float64)
+    return {
+        "undirected_strengths": strengths(W),
+        # bct.betweenness_wei is given the connection matrix, so weights act as lengths here
+        "undirected_betweenness_centralities": betweenness(W),
+        "undirected_clustering_coefs": clustering_coefs(W),
+        "local_efficiency": local_efficiency(W),
+        "density": density(W),
+        "global_efficiency": global_efficiency(W),
+        "char_path_length": char_path_length(W),
+        "undirected_transitivity_wu": transitivity(W),
+    }
@@ -0,0 +1,302 @@
+"""Matplotlib drawing of the graph and spectrum panels, without any Qt.
+
+GraphPlot holds the drawing logic the GUI uses, so headless export
+(MRSightExport) renders figures exactly as the panels look. Subclasses
+provide the axes and the few pieces of UI state the drawing depends on.
+"""
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba_array
+from matplotlib.lines import Line2D
+from EdgeCollection import EdgeCollection, EdgePatches
+from PerformanceMetrics import timed
+
+METABOLITE_COLORS = {
+    "ATPα": '#FF3333',        # Bright Red
+    "ATPβ": '#33FF33',        # Bright Green
+    "ATPγ": '#FFFF33',        # Bright Yellow
+    "PCr": '#3366FF',         # Bright Blue
+    "Pi": '#FF8000',          # Bright Orange
+    "NAD+": "#D370F4",        # Bright Purple
+    "NADH": '#00FFFF',        # Bright Cyan
+    "MP": '#FF33FF',          # Bright Magenta
+    "GPC": '#CCFF00',         # Bright Lime
+    "GPE": '#FF99CC',         # Bright Pink
+    "PC (PDE)": '#00CC99',    # Bright Teal
+    "PE (PDE)": '#BB99FF',    # Bright Lavender
+    "DPG_d": '#FF9966',       # Bright Coral
+    "DPG_t": '#FFB700',       # Bright Amber
+}
+
+plot_gray_style = {
+    'axes.facecolor': '2E2E2E',    # Dark gray background for axes
+    'figure.facecolor': '2b2b2b',  # Dark gray background for the figure
+    'axes.edgecolor': 'white',      # White edges for axes
+    'axes.labelcolor': 'white',     # White labels
+    'xtick.color': 'white',         # White tick marks on x-axis
+    'ytick.color': 'white',         # White tick marks on y-axis
+    'text.color': 'white',          # White text
+    'grid.color': '#444444',        # Slightly lighter grid lines
+    'grid.linestyle': '--',         # Dashed grid lines
+    'lines.color': 'cyan',          # Default line color
+    'patch.edgecolor': 'white',     # Edge color for patches
+    'legend.facecolor': '#4C4C4C',  # Darker gray background for legends
+    'legend.edgecolor': 'white',    # White edges for legends
+}
+
+
+class GraphPlot:
+    """Spectrum and graph artists for primary_graph (and comparison_graph when comparing).
+
+    Drawing reads `graph_axes`, `spectrum_axes`, `primary_graph`,
+    `comparison_graph`, `subject_index`, `comparison_subject_index` and
+    `selected_metabolite` from the instance, and UI state through the hooks
+    below, whose defaults suit a static figure: every metabolite shown, no
+    comparison, titles on the axes.
+    """
+
+    # Edge rendering: "patches" (one Arrow per edge), "collection" (one LineCollection),
+    # or "auto" to use patches only for graphs with at most PATCH_EDGE_LIMIT edges
+    RENDER_MODE = "auto"
+    PATCH_EDGE_LIMIT = 30
+
+    def is_checked(self, name):
+        return True
+
+    def comparison_enabled(self):
+        return False
+
+    def subject_label(self, subject_id):
+        return self.primary_graph.dataset.subject_label(subject_id)
+
+    def set_graph_title(self, title):
+        self.graph_axes.set_title(title)
+
+    def set_spectrum_title(self, title):
+        self.spectrum_axes.set_title(title)
+
+    def request_redraw(self, figure):
+        figure.canvas.draw_idle()
+
+    def invalidate_hover(self):
+        """Called whenever the graph artists change; the GUI drops its hover state here."""
+
+    @timed("ui.draw_spectrum")
+    def draw_spectrum(self):
+        """Create the spectrum artists; later state changes only update them."""
+        axes = self.spectrum_axes
+        axes.clear()
+        axes.grid(True)
+
+        shifts = self.primary_graph.dataset.chemical_shifts_array
+        self.primary_spectrum_line, = axes.plot(shifts, self.primary_graph.current_spectrum, linewidth=0.5, color='red')
+        self.comparison_spectrum_line, = axes.plot(shifts, self.comparison_graph.current_spectrum, linewidth=0.2, color='white')
+
+        axes.set_xlabel("Chemical Shift (ppm)")
+        axes.set_ylabel("Signal Intensity")
+
+        # One vertical line per metabolite, hidden while its checkbox is unchecked
+        self.spectrum_guides = {
+            node["name"]: axes.axvline(
+                x=node["coordinates"][0],
+                color=METABOLITE_COLORS[node["name"]],
+                linestyle='--',
+                label=node["name"],
+                linewidth=0.5
+            )
+            for node in self.primary_graph.nodes
+        }
+
+        axes.invert_xaxis()
+        self.update_spectrum()
+
+    @timed("ui.update_spectrum")
+    def update_spectrum(self):
+        """Refresh spectrum data, the comparison overlay and metabolite lines in place."""
+        comparison = self.comparison_enabled()
+        self.primary_spectrum_line.set_ydata(self.primary_graph.current_spectrum)
+        self.comparison_spectrum_line.set_ydata(self.comparison_graph.current_spectrum)
+        self.comparison_spectrum_line.set_visible(comparison)
+        for name, guide in self.spectrum_guides.items():
+            guide.set_visible(self.is_checked(name))
+
+        if comparison:
+            self.set_spectrum_title(
+                f"MRS Spectrum - {self.subject_label(self.subject_index)} vs {self.subject_label(self.comparison_subject_index)}"
+            )
+        else:
+            self.set_spectrum_title(f"MRS Spectrum - {self.subject_label(self.subject_index)}")
+
+        axes = self.spectrum_axes
+        axes.relim(visible_only=True)
+        axes.autoscale_view()
+        self.request_redraw(self.spectrum_axes.figure)
+
+    @timed("ui.draw_graph")
+    def draw_graph(self):
+        """Rebuild the graph artists for the current primary and comparison graphs.
+
+        Only needed when a graph changes (subject, comparison subject or graph type);
+        selection, checkbox and comparison toggles go through update_graph instead.
+        """
+        axes = self.graph_axes
+        axes.clear()
+        axes.grid(True)
+
+        self.setup_tooltips()
+
+        primary, comparison = self.primary_graph, self.comparison_graph
+        self.edge_layers = {
+            "primary": self.add_edges(primary, [METABOLITE_COLORS[name] for name in primary.node_names]),
+            "comparison": self.add_edges(comparison, ['white'] * len(comparison.node_names)),
+        }
+        self.node_layers = {
+            "comparison": self.add_nodes(comparison, ['white'] * len(comparison.node_names)),
+            "primary": self.add_nodes(primary, [METABOLITE_COLORS[name] for name in primary.node_names]),
+        }
+
+        # Vertical lines, with proxy handles standing in for them in the legend
+        self.node_guides = LineCollection(
+            [[(x, 0), (x, 1)] for x in primary.node_shifts],
+            colors=[METABOLITE_COLORS[name] for name in primary.node_names],
+            linestyles='--', linewidths=1, transform=axes.get_xaxis_transform()
+        )
+        axes.add_collection(self.node_guides, autolim=False)
+
+        axes.set_xlabel("Chemical Shift (ppm)")
+        axes.set_ylabel("Metabolite Intensity")
+        if len(primary.node_shifts):
+            axes.set_xlim(primary.node_shifts.max() + 2, primary.node_shifts.min() - 2)
+        self.update_graph()
+
+    @timed("ui.update_graph")
+    def update_graph(self):
+        """Apply the selection, checkboxes and comparison state to the existing graph artists."""
+        primary, comparison = self.primary_graph, self.comparison_graph
+        compare = self.comparison_enabled() and self.selected_metabolite is not None
+        self.all_y = []
+        self.invalidate_hover()
+
+        # Primary edges: in focus mode only the selected metabolite's edges, in its colour
+        checked = self.checked_mask(primary)
+        displayed, focused = self.edge_masks(primary, checked)
+        edges = primary.edge_array
+        if self.selected_metabolite is None:
+            shown = displayed
+            colors = [METABOLITE_COLORS[primary.node_names[source]] for source in edges["source"].tolist()]
+        else:
+            shown = focused
+            colors = [METABOLITE_COLORS[self.selected_metabolite]] * len(edges)
+        self.edge_layers["primary"].restyle(shown, colors)
+        self.all_y.extend(primary.node_intensities[edges["source"][displayed]].tolist())
+        self.all_y.extend(primary.node_intensities[edges["target"][displayed]].tolist())
+
+        # Comparison edges and nodes, shown only around the selected metabolite
+        comparison_checked = self.checked_mask(comparison)
+        comparison_shown = self.edge_masks(comparison, comparison_checked)[1] & compare
+        self.edge_layers["comparison"].restyle(comparison_shown)
+        comparison_edges = comparison.edge_array[comparison_shown]
+        self.all_y.extend(comparison.node_intensities[comparison_edges["source"]].tolist())
+        self.all_y.extend(comparison.node_intensities[comparison_edges["target"]].tolist())
+
+        self.restyle_nodes("comparison", comparison_checked & compare, 0.2)
+        alphas = np.array([1.0 if self.selected_metabolite in (None, name) else 0.2 for name in primary.node_names])
+        self.restyle_nodes("primary", checked, alphas)
+
+        guide_colors = to_rgba_array([METABOLITE_COLORS[name] for name in primary.node_names])
+        guide_colors[:, 3] = checked
+        self.node_guides.set_color(guide_colors)
+        self.legend_handles = [
+            Line2D([], [], color=METABOLITE_COLORS[name], linestyle='--', linewidth=1, label=name)
+            for name, shown in zip(primary.node_names, checked) if shown
+        ]
+
+        self.configure_graph_display()
+
+    def setup_tooltips(self):
+        """Initialize tooltips for the graph.
+
+        Tooltips are animated: they are left out of full redraws and blitted on
+        top of the cached graph background instead.
+        """
+        self.edges_tooltip = self.graph_axes.annotate(
+            "", xy=(0, 0), xytext=(15, 15), textcoords="offset points",
+            bbox=dict(boxstyle="round", fc="red", alpha=0.8),
+            ha="center", animated=True
+        )
+        self.nodes_tooltip = self.graph_axes.annotate(
+            "", xy=(0, 0), xytext=(15, 15), textcoords="offset points",
+            bbox=dict(boxstyle="round", fc="blue", alpha=0.8),
+            ha="center", animated=True
+        )
+        self.nodes_tooltip.set_visible(False)
+        self.edges_tooltip.set_visible(False)
+
+    def add_edges(self, graph, node_colors):
+        """Create the edge layer of a graph, one edge per row of its edge array, coloured by source node."""
+        edges = graph.edge_array
+        sources, targets = edges["source"], edges["target"]
+        starts = np.column_stack((graph.node_shifts[sources], graph.node_intensities[sources]))
+        ends = np.column_stack((graph.node_shifts[targets], graph.node_intensities[targets]))
+        colors = [node_colors[source] for source in sources.tolist()]
+        metas = [
+            {"source": graph.node_names[source], "target": graph.node_names[target], "ratio": weight}
+            for source, target, weight in zip(sources.tolist(), targets.tolist(), edges["weight"].tolist())
+        ]
+
+        if self.RENDER_MODE == "collection" or (self.RENDER_MODE == "auto" and len(edges) > self.PATCH_EDGE_LIMIT):
+            layer = EdgeCollection
+        else:
+            layer = EdgePatches
+        return layer(self.graph_axes, starts, ends, colors, edges["linewidth"], edges["alpha"], metas)
+
+    def checked_mask(self, graph):
+        """Boolean mask over graph.nodes of the metabolites whose checkbox is checked."""
+        return np.array([self.is_checked(name) for name in graph.node_names], dtype=bool)
+
+    def edge_masks(self, graph, checked):
+        """(displayed, focused) edge masks for the current checkboxes and selection.
+
+        An edge is displayed when both ends are checked or it touches the selected
+        metabolite, and focused when both ends are checked and it touches the
+        selected metabolite.
+        """
+        sources, targets = graph.edge_array["source"], graph.edge_array["target"]
+        both_checked = checked[sources] & checked[targets]
+        selected = graph.node_index.get(self.selected_metabolite, -1)
+        involved = (sources == selected) | (targets == selected)
+        return both_checked | involved, involved & both_checked
+
+    def add_nodes(self, graph, colors):
+        """Create a graph's nodes as a single scatter collection."""
+        scatter = self.graph_axes.scatter(
+            graph.node_shifts, graph.node_intensities, s=64, c=colors, marker="o", zorder=2
+        )
+        scatter.base_colors = to_rgba_array(colors)
+        return scatter
+
+    def restyle_nodes(self, layer, shown, alphas):
+        """Hide nodes outside the `shown` mask and set the alpha of the others."""
+        scatter = self.node_layers[layer]
+        colors = scatter.base_colors.copy()
+        colors[:, 3] = np.where(shown, alphas, 0.0)
+        scatter.set_facecolors(colors)
+        scatter.set_edgecolors(colors)
+
+    def configure_graph_display(self):
+        """Configure graph limits, titles and legend, then schedule a redraw."""
+        if self.all_y and self.primary_graph.nodes:
+            min_y, max_y = min(self.all_y), max(self.all_y)
+            bottom_y_limit = min_y * 1.5 if min_y < 0 else min_y - (0.5 * min_y)
+            self.graph_axes.set_ylim(bottom_y_limit, max_y * 1.05)
+
+        if self.comparison_enabled() and self.selected_metabolite is not None:
+            self.set_graph_title(
+                f"Ratio-Weighted {self.primary_graph.graph_type} - {self.subject_label(self.subject_index)} vs {self.subject_label(self.comparison_subject_index)}"
+                )
+        else:
+            self.set_graph_title(
+                f"Ratio-Weighted {self.primary_graph.graph_type} - {self.subject_label(self.subject_index)}"
+            )
+        self.graph_axes.legend(handles=self.legend_handles, loc='upper right')
+        self.request_redraw(self.graph_axes.figure)
@@ -0,0 +1,230 @@
+"""Permutation and bootstrap tests on global graph features.
+
+Two subjects are compared with a node-swap permutation test: under the null
+hypothesis each metabolite's peak is equally likely to belong to either
+subject, so every resample swaps a random subset of peaks between them and
+rebuilds both graphs. Two groups of subjects (e.g. Time 1 vs Time 2) are
+compared on their per-subject features with a label permutation test (a
+sign-flip test when paired) and a bootstrap confidence interval of the mean
+difference.
+
+All graphs are built and measured as stacked arrays (see Cohort and
+GraphMetrics). Resamples run in fixed-size chunks, each with its own RNG
+stream spawned from one seed, across a process pool; results depend on the
+seed and chunk size, not on the number of workers.
+
+Usage:
+    python GraphStatistics.py subjects 0 1 [--graph-type ...] [--resamples N] [--seed S] [--workers N]
+    python GraphStatistics.py groups --a 0 2 4 --b 1 3 5 [--paired]
+    python GraphStatistics.py timepoints    # Time 1 vs Time 2 of every subject, paired
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from GraphMetrics import GLOBAL_METRICS, global_metrics
+
+DEFAULT_RESAMPLES = 10000
+CHUNK_SIZE = 250
+# Relative tolerance within which a resample counts as equal to the observed statistic, as in
+# scipy.stats.permutation_test: rebuilt graphs reach the same value through different rounding
+TIE_TOLERANCE = 100 * np.finfo(np.float64).eps
+
+
+def chunk_tasks(resamples, seed_sequence, chunk_size=CHUNK_SIZE):
+    """(RNG stream, resample count) per chunk."""
+    if resamples < 1:
+        raise ValueError(f"At least one resample is needed, not {resamples}")
+    counts = [chunk_size] * (resamples // chunk_size)
+    if resamples % chunk_size:
+        counts.append(resamples % chunk_size)
+    return list(zip(seed_sequence.spawn(len(counts)), counts))
+
+
+def run_chunks(function, tasks, workers=None):
+    """Run chunk tasks, in-process or across a process pool, and join their per-metric arrays."""
+    workers = workers or os.cpu_count()
+    if workers <= 1 or len(tasks) <= 1:
+        results = [function(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            results = list(executor.map(function, tasks))
+    return {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+
+
+def p_value(null, observed):
+    """Two-sided permutation p-value, counting the observed arrangement as one resample."""
+    observed = np.abs(observed)
+    return float((1 + np.count_nonzero(np.abs(null) >= observed - TIE_TOLERANCE * observed)) / (len(null) + 1))
+
+
+def subject_permutation_chunk(task):
+    intensities_a, intensities_b, graph_type, names, seed, count = task
+    from WeightedVisibilityGraph import Cohort
+
+    swap = np.random.default_rng(seed).random((count, len(intensities_a))) < 0.5
+    permuted_a = np.where(swap, intensities_b, intensities_a)
+    permuted_b = np.where(swap, intensities_a, intensities_b)
+    cohort = Cohort(graph_type=graph_type, intensities=np.concatenate((permuted_a, permuted_b)))
+    metrics = global_metrics(cohort.connection_matrices, names)
+    return {name: values[:count] - values[count:] for name, values in metrics.items()}
+
+
+def compare_subjects(subject_a, subject_b, graph_type="Complete Metabolite Graph", names=None,
+                     resamples=DEFAULT_RESAMPLES, seed=0, workers=None, dataset=None):
+    """Node-swap permutation test of every global feature between two subjects."""
+    from WeightedVisibilityGraph import Cohort
+
+    names = list(names or GLOBAL_METRICS)
+    cohort = Cohort([subject_a, subject_b], graph_type, dataset)
+    observed = global_metrics(cohort.connection_matrices, names)
+
+    intensities_a, intensities_b = cohort.intensities
+    tasks = [(intensities_a, intensities_b, graph_type, names, stream, count)
+             for stream, count in chunk_tasks(resamples, np.random.SeedSequence(seed))]
+    null = run_chunks(subject_permutation_chunk, tasks, workers)
+
+    results = {}
+    for name in names:
+        a, b = observed[name]
+        results[name] = {"a": float(a), "b": float(b), "difference": float(a - b),
+                         "p_value": p_value(null[name], a - b)}
+    return results
+
+
+def group_permutation_chunk(task):
+    values_a, values_b, paired, seed, count = task
+    rng = np.random.default_rng(seed)
+    size_a = len(next(iter(values_a.values())))
+    if paired:
+        signs = rng.choice((-1.0, 1.0), size=(count, size_a))
+        return {name: np.mean(signs * (values_a[name] - values_b[name]), axis=1) for name in values_a}
+
+    size = size_a + len(next(iter(values_b.values())))
+    order = rng.permuted(np.broadcast_to(np.arange(size), (count, size)), axis=1)
+    null = {}
+    for name in values_a:
+        pooled = np.concatenate((values_a[name], values_b[name]))[order]
+        null[name] = pooled[:, :size_a].mean(axis=1) - pooled[:, size_a:].mean(axis=1)
+    return null
+
+
+def group_bootstrap_chunk(task):
+    values_a, values_b, paired, seed, count = task
+    rng = np.random.default_rng(seed)
+    size_a = len(next(iter(values_a.values())))
+    size_b = len(next(iter(values_b.values())))
+    if paired:
+        rows = rng.integers(0, size_a, size=(count, size_a))
+        return {name: np.mean((values_a[name] - values_b[name])[rows], axis=1) for name in values_a}
+
+    rows_a = rng.integers(0, size_a, size=(count, size_a))
+    rows_b = rng.integers(0, size_b, size=(count, size_b))
+    return {name: values_a[name][rows_a].mean(axis=1) - values_b[name][rows_b].mean(axis=1) for name in values_a}
+
+
+def compare_groups(group_a, group_b, graph_type="Complete Metabolite Graph", names=None, paired=False,
+                   resamples=DEFAULT_RESAMPLES, confidence=0.95, seed=0, workers=None, dataset=None):
+    """Permutation test and bootstrap interval of the mean difference of every global feature.
+
+    With `paired`, group_a[i] and group_b[i] are the same subject at two time
+    points, and the tests resample the per-pair differences.
+    """
+    from WeightedVisibilityGraph import Cohort
+
+    group_a, group_b = list(group_a), list(group_b)
+    if paired and len(group_a) != len(group_b):
+        raise ValueError("Paired groups need the same number of subjects")
+
+    names = list(names or GLOBAL_METRICS)
+    cohort = Cohort(group_a + group_b, graph_type, dataset)
+    metrics = global_metrics(cohort.connection_matrices, names)
+    values_a = {name: values[:len(group_a)] for name, values in metrics.items()}
+    values_b = {name: values[len(group_a):] for name, values in metrics.items()}
+
+    permutation_seed, bootstrap_seed = np.random.SeedSequence(seed).spawn(2)
+    null = run_chunks(group_permutation_chunk, [
+        (values_a, values_b, paired, stream, count) for stream, count in chunk_tasks(resamples, permutation_seed)
+    ], workers)
+    bootstrap = run_chunks(group_bootstrap_chunk, [
+        (values_a, values_b, paired, stream, count) for stream, count in chunk_tasks(resamples, bootstrap_seed)
+    ], workers)
+
+    tail = (1 - confidence) / 2
+    results = {}
+    for name in names:
+        difference = float(np.mean(values_a[name] - values_b[name]) if paired
+                           else values_a[name].mean() - values_b[name].mean())
+        low, high = np.quantile(bootstrap[name], [tail, 1 - tail])
+        results[name] = {"a": float(values_a[name].mean()), "b": float(values_b[name].mean()),
+                         "difference": difference, "p_value": p_value(null[name], difference),
+                         "ci_low": float(low), "ci_high": float(high)}
+    return results
+
+
+def print_results(results):
+    has_interval = "ci_low" in next(iter(results.values()))
+    header = f"{'feature':<32}{'a':>12}{'b':>12}{'difference':>14}{'p':>10}"
+    print(header + (f"{'interval':>28}" if has_interval else ""))
+    for name, result in results.items():
+        line = (f"{name:<32}{result['a']:>12.4g}{result['b']:>12.4g}"
+                f"{result['difference']:>14.4g}{result['p_value']:>10.4f}")
+        if has_interval:
+            line += f"{'[' + format(result['ci_low'], '.4g') + ', ' + format(result['ci_high'], '.4g') + ']':>28}"
+        print(line)
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {value}")
+    return value
+
+
+def parse_args():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--graph-type", default="Complete Metabolite Graph")
+    common.add_argument("--features", nargs="+", choices=list(GLOBAL_METRICS), default=None)
+    common.add_argument("--resamples", type=positive_int, default=DEFAULT_RESAMPLES)
+    common.add_argument("--seed", type=int, default=0)
+    common.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    subjects = commands.add_parser("subjects", parents=[common], help="node-swap permutation test between two subjects")
+    subjects.add_argument("subject_a", type=int)
+    subjects.add_argument("subject_b", type=int)
+
+    groups = commands.add_parser("groups", parents=[common], help="permutation test and bootstrap between two groups")
+    groups.add_argument("--a", type=int, nargs="+", required=True)
+    groups.add_argument("--b", type=int, nargs="+", required=True)
+    groups.add_argument("--paired", action="store_true")
+    groups.add_argument("--confidence", type=float, default=0.95)
+
+    timepoints = commands.add_parser("timepoints", parents=[common], help="Time 1 vs Time 2 of every subject, paired")
+    timepoints.add_argument("--confidence", type=float, default=0.95)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    options = dict(graph_type=args.graph_type, names=args.features, resamples=args.resamples,
+                   seed=args.seed, workers=args.workers)
+    if args.command == "subjects":
+        results = compare_subjects(args.subject_a, args.subject_b, **options)
+    elif args.command == "groups":
+        results = compare_groups(args.a, args.b, paired=args.paired, confidence=args.confidence, **options)
+    else:
+        from WeightedVisibilityGraph import get_dataset
+        # The CSV's spectrum columns alternate Time 1 / Time 2 of each subject
+        source_columns = get_dataset().spectrum_store.source_columns
+        columns = range(source_columns - source_columns % 2)
+        results = compare_groups(columns[0::2], columns[1::2], paired=True, confidence=args.confidence, **options)
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
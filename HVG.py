@@ -1,13 +1,50 @@
-import networkx as nx
+import numpy as np
+
+
+def horizontal_visibility_edges(series):
+    """Edges (i, j), i < j, of the horizontal visibility graph as an (E, 2) array.
+
+    Two points see each other when every point between them is strictly lower
+    than both. A monotonic stack of still-visible points makes this O(n).
+    """
+    values = np.asarray(series, dtype=np.float64).tolist()
+    edges = []
+    stack = []
+    for j, value in enumerate(values):
+        while stack and values[stack[-1]] < value:
+            edges.append((stack.pop(), j))
+        if stack:
+            edges.append((stack[-1], j))
+            # An equal point blocks everything behind it
+            if values[stack[-1]] == value:
+                stack.pop()
+        stack.append(j)
+
+    edges = np.array(edges, dtype=np.intp).reshape(-1, 2)
+    return edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+
+
+def horizontal_visibility_masks(series):
+    """Batched horizontal visibility: (..., n) series to (..., n, n) masks, True at visible (i, j), i < j.
+
+    Meant for many short series at once, such as every subject's metabolite
+    peaks; O(n^2) per series.
+    """
+    y = np.asarray(series, dtype=np.float64)
+    n = y.shape[-1]
+    # Highest point strictly between i and j, -inf for neighbours
+    between = np.broadcast_to(np.where(np.tri(n, k=-1, dtype=bool).T, y[..., None, :], -np.inf), y.shape[:-1] + (n, n))
+    highest = np.full(between.shape, -np.inf)
+    highest[..., 1:] = np.maximum.accumulate(between[..., :-1], axis=-1)
+    lower_end = np.minimum(y[..., :, None], y[..., None, :])
+    return np.triu(highest < lower_end, k=1)
+
 
 def horizontal_visibility_graph(series):
-    n = len(series)
+    """networkx wrapper around horizontal_visibility_edges."""
+    import networkx as nx
+
     G = nx.Graph()
-    G.add_nodes_from(range(n))
-    for i in range(n):
-        for j in range(i + 1, n):
-            if all(series[k] < min(series[i], series[j]) for k in range(i + 1, j)):
-                G.add_edge(i, j)
-            else:
-                break
+    G.add_nodes_from(range(len(series)))
+    G.add_edges_from(horizontal_visibility_edges(series).tolist())
     return G
@@ -0,0 +1,66 @@
+import numpy as np
+
+
+class HitIndex:
+    """Hover hit testing for the graph view's edges and nodes.
+
+    Edge segments are bucketed into a uniform grid in display (pixel)
+    coordinates, so a query only measures the few segments that pass near its
+    cell. Nodes keep the UI's ppm band test around each chemical shift and are
+    answered with a binary search over the sorted shifts. Build a new index
+    whenever the layout (limits, figure size) or the visible items change.
+    """
+
+    def __init__(self, starts, ends, edge_keys, node_shifts, node_keys, radius=5.0, cell_size=32.0, node_threshold=0.3):
+        self.starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        self.ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        self.edge_keys = list(edge_keys)
+        self.radius = radius
+        self.cell_size = cell_size
+        self.cells = self.build_grid()
+
+        node_shifts = np.asarray(node_shifts, dtype=np.float64)
+        self.node_order = np.argsort(node_shifts, kind="stable")
+        self.sorted_shifts = node_shifts[self.node_order]
+        self.node_keys = list(node_keys)
+        self.node_threshold = node_threshold
+
+    def build_grid(self):
+        """Map each grid cell to the indices of the segments whose padded bounding box overlaps it."""
+        low = np.floor((np.minimum(self.starts, self.ends) - self.radius) / self.cell_size).astype(np.int64)
+        high = np.floor((np.maximum(self.starts, self.ends) + self.radius) / self.cell_size).astype(np.int64)
+
+        cells = {}
+        for index, ((x0, y0), (x1, y1)) in enumerate(zip(low.tolist(), high.tolist())):
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    cells.setdefault((cx, cy), []).append(index)
+        return {cell: np.array(indices, dtype=np.intp) for cell, indices in cells.items()}
+
+    def edge_at(self, x, y):
+        """Key of the first edge within `radius` pixels of display point (x, y), or None."""
+        cell = (int(np.floor(x / self.cell_size)), int(np.floor(y / self.cell_size)))
+        candidates = self.cells.get(cell)
+        if candidates is None:
+            return None
+
+        starts, ends = self.starts[candidates], self.ends[candidates]
+        direction = ends - starts
+        length_squared = np.einsum("ij,ij->i", direction, direction)
+        point = np.array((x, y))
+        t = np.einsum("ij,ij->i", point - starts, direction) / np.where(length_squared > 0, length_squared, 1.0)
+        closest = starts + np.clip(t, 0.0, 1.0)[:, None] * direction
+        distance = np.hypot(*(point - closest).T)
+
+        hits = candidates[distance <= self.radius]
+        if not len(hits):
+            return None
+        return self.edge_keys[hits.min()]
+
+    def node_at(self, shift):
+        """Key of the first node whose chemical shift is within `node_threshold` ppm of `shift`, or None."""
+        low = np.searchsorted(self.sorted_shifts, shift - self.node_threshold, side="right")
+        high = np.searchsorted(self.sorted_shifts, shift + self.node_threshold, side="left")
+        if low >= high:
+            return None
+        return self.node_keys[self.node_order[low:high].min()]
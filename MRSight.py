@@ -1,13 +1,33 @@
-from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication, QMessageBox
+import os
 import sys
 import time
-import threading
-from Arrow import Arrow
+import numpy as np
+from EventCoalescer import EventCoalescer
+from GraphBuildService import GraphBuildService
+from GraphCache import GraphCache
+from GraphPlot import GraphPlot
+from HitIndex import HitIndex
+from PerformanceMetrics import registry, timed
+from SpectrumIngest import INCOMING_DIR
+from SpectrumWatcher import SpectrumWatcher
 import WeightedVisibilityGraph
 import MRSightUI
 
 
-class MRSight(MRSightUI.MRSightMainWindow):
+class MRSight(MRSightUI.MRSightMainWindow, GraphPlot):
+    # Built graphs kept for instant switching; 18 subjects x 3 graph types fit entirely
+    GRAPH_CACHE_SIZE = 64
+    # Input coalescing: hover is throttled to about one frame, subject changes
+    # are debounced until the combo box has been still for the interval
+    HOVER_INTERVAL_MS = 16
+    SUBJECT_INTERVAL_MS = 150
+    # How long a single click on an edge waits for a second click before flipping it
+    DOUBLE_CLICK_INTERVAL_MS = 250
+    # Directory watched for newly acquired spectrum files (.npy or .csv, one subject each)
+    INCOMING_DIR = INCOMING_DIR
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setup_event_connections()
@@ -16,19 +36,70 @@ class MRSight(MRSightUI.MRSightMainWindow):
 
     def setup_event_connections(self):
         """Set up event handlers for the matplotlib canvas."""
-        self.graph_widget.figure.canvas.mpl_connect("motion_notify_event", self.on_hover)
+        self.hover_events = EventCoalescer(self.on_hover, self.HOVER_INTERVAL_MS, parent=self)
+        self.subject_events = EventCoalescer(self.change_subject, self.SUBJECT_INTERVAL_MS, debounce=True, parent=self)
+        self.comparison_subject_events = EventCoalescer(
+            self.change_comparison_subject, self.SUBJECT_INTERVAL_MS, debounce=True, parent=self
+        )
+        self.graph_widget.figure.canvas.mpl_connect("motion_notify_event", self.hover_events.submit)
         self.graph_widget.figure.canvas.mpl_connect("button_press_event", self.on_click)
+        self.graph_widget.figure.canvas.mpl_connect("draw_event", self.on_graph_draw)
 
     def initialize_data(self):
         """Initialize subject data and graphs."""
         self.subject_index = self.primary_subject_combo.currentIndex()
         self.comparison_subject_index = self.comparison_subject_combo.currentIndex()
-        self.primary_graph = WeightedVisibilityGraph.Graph(self.subject_index)
-        self.comparison_graph = WeightedVisibilityGraph.Graph(self.comparison_subject_index)
+        self.graph_type = "Complete Metabolite Graph"
+        self.graph_cache = GraphCache(self.GRAPH_CACHE_SIZE)
+        self.primary_graph = self.graph_cache.get(self.subject_index, self.graph_type)
+        self.comparison_graph = self.graph_cache.get(self.comparison_subject_index, self.graph_type)
         self.selected_metabolite = None
-        self.double_click_detected = False
-        self.edge_artists = []
+        self.graph_builds = GraphBuildService(self.graph_cache, parent=self)
+        self.graph_builds.built.connect(self.on_graph_built)
+        self.graph_builds.failed.connect(self.on_graph_build_failed)
+        # Both graphs of a graph type change arrive together and are drawn once
+        self.graph_redraws = EventCoalescer(self.redraw_graphs, 0, parent=self)
+        self.pending_click_edge = None
+        self.click_timer = QTimer(self)
+        self.click_timer.setSingleShot(True)
+        self.click_timer.setInterval(self.DOUBLE_CLICK_INTERVAL_MS)
+        self.click_timer.timeout.connect(self.apply_single_click)
+        self.edge_layers = {}
+        self.node_layers = {}
+        self.legend_handles = []
         self.all_y = []
+        self.graph_background = None
+        self.hit_index = None
+        self.hovered = (None, None)
+        # Start of the latest subject or graph type change, until its graphs are drawn
+        self.switch_started = None
+        registry.register_source("graph_cache", self.graph_cache.stats)
+        registry.register_source("graph_builds", self.graph_builds.stats)
+        registry.register_source("events", self.event_stats)
+        # Spectra saved into the incoming directory become new subjects while the app runs
+        self.spectrum_watcher = SpectrumWatcher(self.INCOMING_DIR, WeightedVisibilityGraph.get_dataset(), parent=self)
+        self.spectrum_watcher.subjects_added.connect(self.on_subjects_added)
+        self.spectrum_watcher.failed.connect(self.on_ingest_failed)
+
+    @property
+    def graph_axes(self):
+        return self.graph_widget.axes
+
+    @property
+    def spectrum_axes(self):
+        return self.spectrum_widget.axes
+
+    def is_checked(self, name):
+        return self.checkboxes[name].isChecked()
+
+    def comparison_enabled(self):
+        return self.enable_comparison_check.isChecked()
+
+    def set_graph_title(self, title):
+        self.graph_group.setTitle(title)
+
+    def set_spectrum_title(self, title):
+        self.spectrum_group.setTitle(title)
 
     def initialize_visualization(self):
         """Initialize the visualization components."""
@@ -36,309 +107,134 @@ class MRSight(MRSightUI.MRSightMainWindow):
         self.draw_graph()
         self.write_global_features()
 
-    def draw_spectrum(self):
-        """Draw the spectrum visualization."""
-        self.spectrum_widget.axes.clear()
-        self.spectrum_widget.axes.grid(True)
-        
-        # Plot primary spectrum
-        self.spectrum_widget.axes.plot(
-            WeightedVisibilityGraph.chemical_shifts_array,
-            self.primary_graph.current_spectrum, 
-            linewidth=0.5, 
-            color = 'red'
-        )
-        self.spectrum_group.setTitle(f"MRS Spectrum - Subject: {self.subject_index//2} (Time {self.subject_index%2+1})")
-        # Plot comparison spectrum if enabled
-        if self.enable_comparison_check.isChecked():
-            self.spectrum_widget.axes.plot(
-                WeightedVisibilityGraph.chemical_shifts_array,
-                self.comparison_graph.current_spectrum,
-                linewidth=0.2, 
-                color='white'
-            )
-            self.spectrum_group.setTitle(
-                f"MRS Spectrum - Subject: {self.subject_index//2} (Time {self.subject_index%2+1}) vs Subject: {self.comparison_subject_index//2} (Time {self.comparison_subject_index%2+1})"
-            )
-
-        self.spectrum_widget.axes.set_xlabel("Chemical Shift (ppm)")
-        self.spectrum_widget.axes.set_ylabel("Signal Intensity")
-
-        # Draw vertical lines for metabolites
-        for node in self.primary_graph.nodes:
-            if self.checkboxes[node["name"]].isChecked():
-                self.spectrum_widget.axes.axvline(
-                    x=node["coordinates"][0], 
-                    color=MRSightUI.colors[node["name"]], 
-                    linestyle='--', 
-                    label=node["name"], 
-                    linewidth=0.5
-                )
-
-        self.spectrum_widget.axes.invert_xaxis()
-        self.spectrum_widget.figure.canvas.draw_idle()
-
-    def draw_graph(self):
-        """Draw the graph visualization."""
-        self.graph_widget.axes.clear()
-        self.graph_widget.axes.grid(True)
-        self.edge_artists = []
-        self.all_y = []
-        
-        # Setup tooltips
-        self.setup_tooltips()
-        
-        # Draw edges
-        self.draw_edges()
-        
-        # Toggle comparison mode if enabled
-        self.toggle_comparison_mode(self.enable_comparison_check.isChecked())
-        
-        # Draw nodes
-        self.draw_nodes()
-        
-        # Set graph limits and labels
-        self.configure_graph_display()
-
-    def setup_tooltips(self):
-        """Initialize tooltips for the graph."""
-        self.edges_tooltip = self.graph_widget.axes.annotate(
-            "", xy=(0, 0), xytext=(15, 15), textcoords="offset points",
-            bbox=dict(boxstyle="round", fc="red", alpha=0.8),
-            ha="center"
-        )
-        self.nodes_tooltip = self.graph_widget.axes.annotate(
-            "", xy=(0, 0), xytext=(15, 15), textcoords="offset points",
-            bbox=dict(boxstyle="round", fc="blue", alpha=0.8),
-            ha="center"
-        )
-        self.nodes_tooltip.set_visible(False)
-        self.edges_tooltip.set_visible(False)
-
-    def draw_edges(self):
-        """Draw graph edges."""
-        for edge in self.primary_graph.edges:
-            from_name = edge["source"]
-            to_name = edge["target"]
-
-            # Check if edge should be displayed
-            if not self.should_display_edge(from_name, to_name):
-                continue
-
-            x1, y1 = [node["coordinates"] for node in self.primary_graph.nodes if node["name"] == from_name][0]
-            x2, y2 = [node["coordinates"] for node in self.primary_graph.nodes if node["name"] == to_name][0]
-            
-            arrow = self.create_arrow(x1, y1, x2, y2, from_name, to_name, edge["linewidth"], edge["alpha"], 
-                                      edge["weight"])
-            
-            if arrow:
-                self.graph_widget.axes.add_patch(arrow)
-                self.edge_artists.append(arrow)
-                
-            self.all_y.extend([y1, y2])
-
-    def should_display_edge(self, from_name, to_name):
-        """Check if an edge should be displayed based on current selection."""
-        both_checked = (self.checkboxes[from_name].isChecked() and self.checkboxes[to_name].isChecked())
-        selected_involved = (self.selected_metabolite == from_name or self.selected_metabolite == to_name)
-        
-        return both_checked or selected_involved
-
-    def create_arrow(self, x1, y1, x2, y2, from_name, to_name, linewidth, alpha, weight):
-        """Create an arrow for the graph."""
-        arrow = Arrow(
-            posA=(x1, y1), 
-            posB=(x2, y2),
-            arrowstyle="->",
-            linewidth=linewidth,
-            alpha=alpha,
-            color=MRSightUI.colors[from_name],
-            mutation_scale=15
-        )
-
-        arrow.meta = {
-            "source": from_name,
-            "target": to_name,
-            "ratio": weight
-        }
-        
-        if self.selected_metabolite is not None:
-            selected_involved = (self.selected_metabolite == from_name or self.selected_metabolite == to_name)
-            both_checked = (self.checkboxes[from_name].isChecked() and self.checkboxes[to_name].isChecked())
-            
-            if not (selected_involved and both_checked):
-                return None
-            
-            arrow.set_color(MRSightUI.colors[self.selected_metabolite])
-            
-        return arrow
-
-    def draw_nodes(self):
-        """Draw graph nodes."""
-        for node in self.primary_graph.nodes:
-            if not self.checkboxes[node["name"]].isChecked():
-                continue
-                
-            x, y = node["coordinates"]
-            color = MRSightUI.colors[node["name"]]
-            alpha = 1.0
-            size = 8
-            
-            if self.selected_metabolite is not None:
-                if self.selected_metabolite != node["name"]:
-                    alpha = 0.2
-            
-            # Draw node
-            self.graph_widget.axes.plot(x, y, marker="o", color=color, markersize=size, alpha=alpha)
-            
-            # Draw vertical line
-            self.graph_widget.axes.axvline(
-                x=x, color=color, linestyle='--', label=node["name"], linewidth=1
-            )
-
-    def configure_graph_display(self):
-        """Configure graph display properties."""
-        # Set axis limits if we have data
-        if self.all_y and self.primary_graph.nodes:
-            all_x = [node["coordinates"][0] for node in self.primary_graph.nodes]
-            min_y, max_y = min(self.all_y), max(self.all_y)
-            bottom_y_limit = min_y * 1.5 if min_y < 0 else min_y - (0.5 * min_y)
-            
-            self.graph_widget.axes.set_xlim(min(all_x) - 2, max(all_x) + 2)
-            self.graph_widget.axes.set_ylim(bottom_y_limit, max_y * 1.05)
-
-        if self.enable_comparison_check.isChecked() and self.selected_metabolite is not None:
-            self.graph_group.setTitle(
-                f"Ratio-Weighted {self.primary_graph.graph_type} - Subject {self.subject_index//2} (Time {self.subject_index%2+1}) vs Subject {self.comparison_subject_index//2} (Time {self.comparison_subject_index%2+1})"
-                )
-        else:
-            self.graph_group.setTitle(
-                f"Ratio-Weighted {self.primary_graph.graph_type} - Subject {self.subject_index//2} (Time {self.subject_index%2+1})"
-            )
-        # Set labels and finalize
-        self.graph_widget.axes.set_xlabel("Chemical Shift (ppm)")
-        self.graph_widget.axes.set_ylabel("Metabolite Intensity")
-        self.graph_widget.axes.invert_xaxis()
-        self.graph_widget.axes.legend(loc='upper right')
-        self.graph_widget.axes.figure.canvas.draw_idle()
+    def find_edge(self, event):
+        """The visible edge artist (or collection edge handle) under the mouse event, or None."""
+        for layer in self.edge_layers.values():
+            edge = layer.hit(event)
+            if edge is not None:
+                return edge
+        return None
 
     def toggle_comparison_mode(self, state):
-        """Toggle display of comparison subject data."""
-        self.draw_spectrum()
-        
-        if state and self.selected_metabolite is not None:
-            self.draw_comparison_data()
-            
+        """Toggle display of comparison subject data without rebuilding any artists."""
+        self.update_spectrum()
+        self.update_graph()
         self.write_global_features()
 
-    def draw_comparison_data(self):
-        """Draw comparison data when enabled."""
-        # Draw comparison edges
-        for edge in self.comparison_graph.edges:
-            source_name = edge["source"]
-            target_name = edge["target"]
-            
-            if ((edge["source"] == self.selected_metabolite or edge["target"] == self.selected_metabolite) and 
-                self.checkboxes[source_name].isChecked() and self.checkboxes[target_name].isChecked()):
-                
-                x1, y1 = [node["coordinates"] for node in self.comparison_graph.nodes if node["name"] == source_name][0]
-                x2, y2 = [node["coordinates"] for node in self.comparison_graph.nodes if node["name"] == target_name][0]
-                
-                arrow = Arrow(
-                    posA=(x1, y1), posB=(x2, y2),
-                    arrowstyle="->",
-                    linewidth=edge["linewidth"],
-                    alpha=edge["alpha"],
-                    color='white',
-                    mutation_scale=15
-                )
-                
-                arrow.meta = {
-                    "source": source_name,
-                    "target": target_name,
-                    "ratio": edge["weight"]
-                }
-
-                self.graph_widget.axes.add_patch(arrow)
-                self.edge_artists.append(arrow)
-                self.all_y.extend([y1, y2])
-        
-        # Draw comparison nodes
-        for node in self.comparison_graph.nodes:
-            if self.checkboxes[node["name"]].isChecked():
-                self.graph_widget.axes.plot(
-                    node["coordinates"][0], 
-                    node["coordinates"][1], 
-                    marker="o",
-                    color='white', 
-                    markersize=8, 
-                    alpha=0.2
-                )
+    def update_metabolite_visibility(self):
+        """Follow a metabolite checkbox change in both plots."""
+        self.update_graph()
+        self.update_spectrum()
+
+    def on_graph_draw(self, event):
+        """Cache the freshly drawn graph as the background tooltips are blitted onto."""
+        canvas = self.graph_widget.figure.canvas
+        self.graph_background = canvas.copy_from_bbox(self.graph_widget.figure.bbox)
+        # Limits or size may have changed, so edge positions on screen may have too
+        self.hit_index = None
+        self.draw_tooltips()
+
+    def draw_tooltips(self):
+        axes = self.graph_widget.axes
+        for tooltip in (self.edges_tooltip, self.nodes_tooltip):
+            if tooltip.get_visible():
+                axes.draw_artist(tooltip)
+
+    @timed("ui.blit_tooltips")
+    def blit_tooltips(self):
+        """Redraw only the tooltip layer over the cached graph background."""
+        canvas = self.graph_widget.figure.canvas
+        if self.graph_background is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self.graph_background)
+        self.draw_tooltips()
+        canvas.blit(self.graph_widget.figure.bbox)
 
+    @timed("ui.hover")
     def on_hover(self, event):
-        """Handle hover events over the graph."""
+        """Handle hover events over the graph, blitting the tooltips only when the hovered item changes."""
         if event.inaxes != self.graph_widget.axes:
             return
 
+        index = self.get_hit_index()
+        edge = index.edge_at(event.x, event.y)
+        node = index.node_at(event.xdata) if self.enable_node_metadata_check.isChecked() else self.hovered[1]
+        if (edge, node) == self.hovered:
+            return
+        self.hovered = (edge, node)
+
         # Check for hovering over edges
-        self.handle_edge_hover(event)
-        
+        self.handle_edge_hover(event, edge)
+
         # Check for hovering over nodes
-        self.handle_node_hover(event)
-        
-        self.graph_widget.figure.canvas.draw_idle()
+        self.handle_node_hover(event, node)
+
+        self.blit_tooltips()
+
+    def get_hit_index(self):
+        """The hover hit index for the current layout, built on first use after a change."""
+        if self.hit_index is None:
+            transform = self.graph_widget.axes.transData
+            starts, ends, keys = [], [], []
+            for layer in self.edge_layers.values():
+                layer_starts, layer_ends, visible = layer.segment_arrays()
+                starts.append(transform.transform(layer_starts[visible]))
+                ends.append(transform.transform(layer_ends[visible]))
+                keys.extend(edge for edge, shown in zip(layer.edges, visible) if shown)
+
+            graph = self.primary_graph
+            eligible = [index for index, name in enumerate(graph.node_names)
+                        if self.checkboxes[name].isChecked() or self.selected_metabolite == name]
+            self.hit_index = HitIndex(
+                np.concatenate(starts) if starts else [], np.concatenate(ends) if ends else [], keys,
+                graph.node_shifts[eligible], eligible
+            )
+        return self.hit_index
+
+    def invalidate_hover(self):
+        """Drop the hit index and hovered item after the layout or visible items change."""
+        self.hit_index = None
+        self.hovered = (None, None)
 
-    def handle_edge_hover(self, event):
+    def handle_edge_hover(self, event, arrow):
         """Handle hover over graph edges."""
-        visible = False
-        for arrow in self.edge_artists:
-            contains, _ = arrow.contains(event)
-            if contains:
-                meta = arrow.meta
-                self.edges_tooltip.xy = (event.xdata, event.ydata)
-                self.edges_tooltip.set_text(
-                    f"{meta['source']} → {meta['target']}\n"
-                    f"Ratio: {meta['ratio']:.4f}"
-                )
-                self.edges_tooltip.set_visible(True)
-                visible = True
-                break
-
-        if not visible:
+        if arrow is not None:
+            meta = arrow.meta
+            self.edges_tooltip.xy = (event.xdata, event.ydata)
+            self.edges_tooltip.set_text(
+                f"{meta['source']} → {meta['target']}\n"
+                f"Ratio: {meta['ratio']:.4f}"
+            )
+            self.edges_tooltip.set_visible(True)
+        else:
             self.edges_tooltip.set_visible(False)
 
-    def handle_node_hover(self, event):
+    def handle_node_hover(self, event, index):
         """Handle hover over graph nodes."""
-        visible = False
         if not self.enable_node_metadata_check.isChecked():
             return
-            
-        for index, node in enumerate(self.primary_graph.nodes):
-            if not (self.checkboxes[node["name"]].isChecked() or self.selected_metabolite == node["name"]):
-                continue
-                
-            # Calculate distance from cursor to node
-            distance = abs(event.xdata - node["coordinates"][0])
-
-            # If cursor is close enough to the node
-            if distance < 0.3:  # Threshold for detection
-                self.nodes_tooltip.xy = (event.xdata, event.ydata)
-                self.nodes_tooltip.set_backgroundcolor(MRSightUI.colors[node["name"]])
-                
-                # Format node metadata
-                primary_node_metadata = self.format_node_metadata(self.primary_graph, node, index)
-                if self.enable_comparison_check.isChecked() and self.selected_metabolite is not None:
-                    comparison_node = self.comparison_graph.nodes[index]
-                    comparison_node_metadata = self.format_node_metadata(self.comparison_graph, comparison_node, index, comparison=True)
-                    primary_node_metadata += "\n\nComparison:\n" + comparison_node_metadata
-
-                self.nodes_tooltip.set_text(primary_node_metadata)
-                self.nodes_tooltip.set_visible(True)
-                visible = True
-                break
-                
-        if not visible:
+
+        if index is None:
             self.nodes_tooltip.set_visible(False)
+            return
+
+        node = self.primary_graph.nodes[index]
+        self.nodes_tooltip.xy = (event.xdata, event.ydata)
+        self.nodes_tooltip.set_backgroundcolor(MRSightUI.colors[node["name"]])
+
+        # Format node metadata
+        primary_node_metadata = self.format_node_metadata(self.primary_graph, node, index)
+        if self.enable_comparison_check.isChecked() and self.selected_metabolite is not None:
+            comparison_index = self.comparison_graph.node_index[node["name"]]
+            comparison_node = self.comparison_graph.nodes[comparison_index]
+            comparison_node_metadata = self.format_node_metadata(
+                self.comparison_graph, comparison_node, comparison_index, comparison=True
+            )
+            primary_node_metadata += "\n\nComparison:\n" + comparison_node_metadata
+
+        self.nodes_tooltip.set_text(primary_node_metadata)
+        self.nodes_tooltip.set_visible(True)
 
     def format_node_metadata(self, graph, node, index, comparison=False):
         """Format node metadata for tooltip display."""
@@ -363,11 +259,10 @@ class MRSight(MRSightUI.MRSightMainWindow):
             return
 
         # Check for clicks on edges
-        for arrow in self.edge_artists:
-            contains, _ = arrow.contains(event)
-            if contains:
-                self.handle_edge_click(arrow, event)
-                return
+        arrow = self.find_edge(event)
+        if arrow is not None:
+            self.handle_edge_click(arrow, event)
+            return
 
         # Check for double-clicks to select metabolites
         if event.dblclick:
@@ -376,34 +271,31 @@ class MRSight(MRSightUI.MRSightMainWindow):
     def handle_edge_click(self, arrow, event):
         """Handle clicks on graph edges."""
         if event.dblclick:
-            # Toggle transparency
+            # Toggle transparency, and cancel the flip of the first click
+            self.click_timer.stop()
+            self.pending_click_edge = None
             current_alpha = arrow.get_alpha() or 1.0
             new_alpha = 0.2 if current_alpha > 0.5 else 1.0
             arrow.set_alpha(new_alpha)
             self.graph_widget.figure.canvas.draw_idle()
-            self.double_click_detected = True
         else:
             # Delay single click to handle potential double clicks
-            def delayed_single_click():
-                time.sleep(0.25)  # wait to see if double click happens
-                if not getattr(self, "double_click_detected", False):
-                    self.flip_edge(arrow)
-                    self.graph_widget.figure.canvas.draw_idle()
-                else:
-                    self.double_click_detected = False
-
-            threading.Thread(target=delayed_single_click).start()
+            self.pending_click_edge = arrow
+            self.click_timer.start()
+
+    def apply_single_click(self):
+        """Flip the edge of a single click once no double click followed it."""
+        arrow, self.pending_click_edge = self.pending_click_edge, None
+        if arrow is not None:
+            self.flip_edge(arrow)
+            self.graph_widget.figure.canvas.draw_idle()
 
     def handle_node_selection(self, event):
         """Handle double-click node selection."""
-        min_distance = float('inf')
-        closest_metabolite = None
-
-        for node in self.primary_graph.nodes:
-            distance = abs(event.xdata - node["coordinates"][0])
-            if distance < min_distance:
-                min_distance = distance
-                closest_metabolite = node["name"]
+        distances = np.abs(self.primary_graph.node_shifts - event.xdata)
+        closest = int(np.argmin(distances))
+        min_distance = distances[closest]
+        closest_metabolite = self.primary_graph.node_names[closest]
 
         if self.checkboxes[closest_metabolite].isChecked() and min_distance < 0.2:
             if self.selected_metabolite == closest_metabolite:
@@ -411,43 +303,92 @@ class MRSight(MRSightUI.MRSightMainWindow):
             else:
                 self.selected_metabolite = closest_metabolite
 
-            self.draw_graph()
+            self.update_graph()
 
+    @timed("ui.write_global_features")
     def write_global_features(self):
         """Update the display of global graph features."""
         self.primary_global_features_text.setHtml(MRSightUI.style_global_features(
-            self.subject_index, self.primary_graph
+            self.subject_label(self.subject_index), self.primary_graph
         ))
         
         state = self.enable_comparison_check.isChecked()
         if state:
             self.comparison_global_features_text.setHtml(MRSightUI.style_global_features(
-                self.comparison_subject_index, self.comparison_graph
+                self.subject_label(self.comparison_subject_index), self.comparison_graph
             ))
             
         self.comparison_global_features_text.setVisible(state)
 
+    def request_subject_change(self, index):
+        """Queue a primary subject change; only the last index of a burst is built."""
+        self.subject_events.submit(index)
+
+    def request_comparison_subject_change(self, index):
+        """Queue a comparison subject change; only the last index of a burst is built."""
+        self.comparison_subject_events.submit(index)
+
+    def event_stats(self):
+        """Submitted, delivered and dropped counts of each coalesced input stream."""
+        return {
+            "hover": self.hover_events.stats(),
+            "subject": self.subject_events.stats(),
+            "comparison_subject": self.comparison_subject_events.stats(),
+        }
+
     def change_subject(self, index):
-        """Change the primary subject being displayed."""
+        """Change the primary subject being displayed; the graph is built in the background."""
         self.subject_index = index
-        self.primary_graph.change_subject(self.subject_index)
-        self.draw_spectrum()
-        self.draw_graph()
-        self.write_global_features()
+        self.switch_started = time.perf_counter()
+        self.graph_builds.request("primary", self.subject_index, self.graph_type)
 
     def change_comparison_subject(self, index):
-        """Change the comparison subject being displayed."""
+        """Change the comparison subject being displayed; the graph is built in the background."""
         self.comparison_subject_index = index
-        self.comparison_graph.change_subject(self.comparison_subject_index)
-        self.draw_graph()
-        self.write_global_features()
-    
+        self.switch_started = time.perf_counter()
+        self.graph_builds.request("comparison", self.comparison_subject_index, self.graph_type)
+
     def change_graph_type(self, type):
-        """Change the type of graph being displayed."""
-        self.primary_graph.change_graph_type(type)
-        self.comparison_graph.change_graph_type(type)
+        """Change the type of graph being displayed; both graphs are built in the background."""
+        self.graph_type = type
+        self.switch_started = time.perf_counter()
+        self.graph_builds.request("primary", self.subject_index, self.graph_type)
+        self.graph_builds.request("comparison", self.comparison_subject_index, self.graph_type)
+
+    def on_graph_built(self, role, graph):
+        """Show a graph delivered by the build service."""
+        if role == "primary":
+            self.primary_graph = graph
+        else:
+            self.comparison_graph = graph
+        self.graph_redraws.submit()
+
+    @timed("ui.redraw_graphs")
+    def redraw_graphs(self):
+        """Rebuild both plots for newly delivered graphs."""
+        self.update_spectrum()
         self.draw_graph()
         self.write_global_features()
+        if self.switch_started is not None and not self.graph_builds.is_busy():
+            # From the change request to the redrawn plots, excluding the input debounce
+            registry.record("ui.switch", time.perf_counter() - self.switch_started)
+            self.switch_started = None
+
+    def subject_label(self, subject_id):
+        return self.primary_subject_combo.itemText(subject_id)
+
+    def on_subjects_added(self, subject_ids):
+        """List newly ingested subjects in both combos; the current selections stay as they are."""
+        labels = WeightedVisibilityGraph.get_dataset().subject_labels()
+        for combo in (self.primary_subject_combo, self.comparison_subject_combo):
+            combo.addItems(labels[combo.count():])
+        self.statusBar().showMessage(f"Added {', '.join(labels[i] for i in subject_ids)}", 5000)
+
+    def on_ingest_failed(self, path, message):
+        self.statusBar().showMessage(f"Could not read {path}: {message}", 5000)
+
+    def on_graph_build_failed(self, role, message):
+        QMessageBox.warning(self, "MRSight", f"Could not build the {role} graph:\n{message}")
 
     def flip_edge(self, edge_artist):
         """Flip the direction and ratio of an edge."""
@@ -458,10 +399,15 @@ class MRSight(MRSightUI.MRSightMainWindow):
         edge_artist.set_positions(edge_artist.posB, edge_artist.posA)
         edge_artist.set_linewidth(new_linewidth)
         edge_artist.set_alpha(new_alpha)
+        # The edge tooltip shows the old direction until the pointer moves off and back
+        self.hovered = (None, None)
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MRSight()
     window.show()
-    sys.exit(app.exec_())
+    status = app.exec_()
+    if os.environ.get("MRSIGHT_METRICS_DUMP"):
+        registry.dump(os.environ["MRSIGHT_METRICS_DUMP"])
+    sys.exit(status)
@@ -0,0 +1,120 @@
+"""Headless cohort feature extraction.
+
+Builds a Graph for every subject column of the spectra CSV and every
+requested graph type across a process pool, and writes one row of local
+and global features per (subject, graph type) to a CSV or Parquet table.
+
+Usage: python MRSightBatch.py --output features.csv [--graph-types ...] [--workers N]
+"""
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import SpectrumPreprocessing
+
+METABOLITE_GRAPH_TYPES = ["Complete Metabolite Graph", "Natural Visibility Graph", "Horizontal Visibility Graph"]
+FULL_SPECTRUM_GRAPH_TYPES = ["Full-Spectrum Natural Visibility Graph", "Full-Spectrum Horizontal Visibility Graph"]
+
+LOCAL_FEATURES = {
+    "strength": "undirected_strengths",
+    "betweenness": "undirected_betweenness_centralities",
+    "clustering": "undirected_clustering_coefs",
+    "efficiency": "local_efficiency",
+}
+GLOBAL_FEATURES = [
+    "density", "global_efficiency", "char_path_length", "undirected_transitivity_wu",
+    "average_local_efficiency", "average_betweenness_centrality",
+]
+SPECTRUM_GLOBAL_FEATURES = ["density", "average_degree", "average_strength", "average_clustering_coef"]
+
+
+def init_worker(spectra_path, chemical_shifts_path, preprocessing=None):
+    import WeightedVisibilityGraph
+    WeightedVisibilityGraph.use_dataset(spectra_path, chemical_shifts_path, preprocessing=preprocessing)
+
+
+def graph_features(graph):
+    """Flatten a built Graph into one table row."""
+    row = {"subject": graph.subject_index, "graph_type": graph.graph_type}
+    if graph.is_full_spectrum:
+        row.update({name: float(getattr(graph, name)) for name in SPECTRUM_GLOBAL_FEATURES})
+        return row
+
+    from WeightedVisibilityGraph import metabolite_symbols
+
+    row.update({name: float(getattr(graph, name)) for name in GLOBAL_FEATURES})
+    positions = {node["name"]: index for index, node in enumerate(graph.matrix_nodes)}
+    for feature, attribute in LOCAL_FEATURES.items():
+        values = getattr(graph, attribute)
+        for symbol in metabolite_symbols:
+            row[f"{feature}_{symbol}"] = float(values[positions[symbol]])
+    return row
+
+
+def compute_features(task):
+    import WeightedVisibilityGraph
+    subject_id, graph_type, ppm_window = task
+    return graph_features(WeightedVisibilityGraph.Graph(subject_id, graph_type, ppm_window=ppm_window))
+
+
+def compute_rows(tasks, spectra_path, chemical_shifts_path, workers=None, chunksize=8, preprocessing=None):
+    """Feature rows for (subject, graph type, ppm window) tasks, in task order."""
+    workers = workers or os.cpu_count()
+    if workers <= 1:
+        return [compute_features(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(spectra_path, chemical_shifts_path, preprocessing)) as executor:
+        return list(executor.map(compute_features, tasks, chunksize=chunksize))
+
+
+def write_table(rows, path):
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    if path.endswith(".parquet"):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise SystemExit("Writing Parquet needs pandas and pyarrow; use a .csv output instead")
+        pd.DataFrame(rows, columns=columns).to_parquet(path, index=False)
+        return
+
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compute MRSight graph features for every subject.")
+    parser.add_argument("--spectra", default="Datasets/spectra.csv")
+    parser.add_argument("--chemical-shifts", default="Datasets/chemical_shifts.csv")
+    parser.add_argument("--graph-types", nargs="+", default=METABOLITE_GRAPH_TYPES,
+                        choices=METABOLITE_GRAPH_TYPES + FULL_SPECTRUM_GRAPH_TYPES, metavar="GRAPH_TYPE")
+    parser.add_argument("--subjects", type=int, nargs="+", help="subject columns to process (default: all)")
+    parser.add_argument("--ppm-window", type=float, nargs=2, metavar=("LOW", "HIGH"),
+                        help="chemical shift range for the full-spectrum graph types")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=8)
+    parser.add_argument("--output", default="features.csv", help="output table (.csv or .parquet)")
+    SpectrumPreprocessing.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    import WeightedVisibilityGraph
+    # Open (and if needed build) the spectrum store once before the workers map it
+    preprocessing = SpectrumPreprocessing.from_arguments(args)
+    dataset = WeightedVisibilityGraph.use_dataset(args.spectra, args.chemical_shifts, preprocessing=preprocessing)
+    subjects = args.subjects if args.subjects is not None else range(dataset.subject_count)
+    ppm_window = tuple(args.ppm_window) if args.ppm_window else None
+    tasks = [(subject, graph_type, ppm_window) for graph_type in args.graph_types for subject in subjects]
+
+    rows = compute_rows(tasks, args.spectra, args.chemical_shifts, args.workers, args.chunksize, preprocessing)
+    write_table(rows, args.output)
+    print(f"Wrote {len(rows)} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Headless figure export of the graph and spectrum panels.
+
+Renders the same panels as the GUI (see GraphPlot) for every requested
+subject and graph type with matplotlib's Agg backend, so no display or Qt is
+needed. Work is spread over a process pool; each worker creates one figure
+and redraws it for every subject it is given.
+
+Usage: python MRSightExport.py --output figures [--subjects 0 1 2] [--graph-types ...]
+                               [--formats png svg pdf] [--workers N]
+"""
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.style
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import WeightedVisibilityGraph
+from GraphPlot import GraphPlot, plot_gray_style
+from MRSightBatch import METABOLITE_GRAPH_TYPES, init_worker
+
+FORMATS = ("png", "svg", "pdf")
+
+# The figure reused by this (worker) process
+exporter = None
+
+
+class FigureExporter(GraphPlot):
+    """One Agg figure, graph panel above spectrum panel, redrawn for each (subject, graph type)."""
+
+    def __init__(self, size=(12, 10), dpi=150):
+        matplotlib.style.use(plot_gray_style)
+        self.figure = Figure(figsize=size, dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        self.graph_axes, self.spectrum_axes = self.figure.subplots(2, 1, gridspec_kw={"height_ratios": [3, 2]})
+        self.figure.subplots_adjust(left=0.08, right=0.97, top=0.95, bottom=0.06, hspace=0.25)
+        self.selected_metabolite = None
+        self.spectrum_drawn = False
+
+    def request_redraw(self, figure):
+        # The figure is drawn once, by savefig
+        pass
+
+    def render(self, subject_id, graph_type, stem, formats):
+        """Draw one subject's panels and save them as `stem`.<format>; returns the paths."""
+        graph = WeightedVisibilityGraph.Graph(subject_id, graph_type)
+        self.subject_index = self.comparison_subject_index = subject_id
+        self.primary_graph = self.comparison_graph = graph
+        if self.spectrum_drawn:
+            self.update_spectrum()
+        else:
+            self.draw_spectrum()
+            self.spectrum_drawn = True
+        self.draw_graph()
+
+        paths = []
+        for extension in formats:
+            path = f"{stem}.{extension}"
+            self.figure.savefig(path, facecolor=self.figure.get_facecolor())
+            paths.append(path)
+        return paths
+
+
+def init_exporter(spectra_path, chemical_shifts_path, size, dpi):
+    global exporter
+    init_worker(spectra_path, chemical_shifts_path)
+    exporter = FigureExporter(size, dpi)
+
+
+def export_task(task):
+    subject_id, graph_type, stem, formats = task
+    return exporter.render(subject_id, graph_type, stem, formats)
+
+
+def file_stem(output, subject_id, graph_type):
+    slug = re.sub(r"[^a-z0-9]+", "-", graph_type.lower()).strip("-")
+    return os.path.join(output, f"subject{subject_id:03d}_{slug}")
+
+
+def export_figures(tasks, spectra_path, chemical_shifts_path, size=(12, 10), dpi=150, workers=None, chunksize=4):
+    """Render (subject, graph type, file stem, formats) tasks and return the written paths, in task order."""
+    workers = workers or os.cpu_count()
+    initargs = (spectra_path, chemical_shifts_path, size, dpi)
+    if workers <= 1:
+        init_exporter(*initargs)
+        return [path for task in tasks for path in export_task(task)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_exporter, initargs=initargs) as executor:
+        return [path for paths in executor.map(export_task, tasks, chunksize=chunksize) for path in paths]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export MRSight graph and spectrum figures without a display.")
+    parser.add_argument("--spectra", default="Datasets/spectra.csv")
+    parser.add_argument("--chemical-shifts", default="Datasets/chemical_shifts.csv")
+    parser.add_argument("--graph-types", nargs="+", default=METABOLITE_GRAPH_TYPES, choices=METABOLITE_GRAPH_TYPES,
+                        metavar="GRAPH_TYPE")
+    parser.add_argument("--subjects", type=int, nargs="+", help="subject columns to export (default: all)")
+    parser.add_argument("--formats", nargs="+", default=["png"], choices=FORMATS)
+    parser.add_argument("--size", type=float, nargs=2, default=(12, 10), metavar=("WIDTH", "HEIGHT"),
+                        help="figure size in inches")
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--output", default="figures", help="output directory")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Open (and if needed build) the spectrum store once before the workers map it
+    dataset = WeightedVisibilityGraph.use_dataset(args.spectra, args.chemical_shifts)
+    subjects = args.subjects if args.subjects is not None else range(dataset.subject_count)
+    os.makedirs(args.output, exist_ok=True)
+    tasks = [(subject, graph_type, file_stem(args.output, subject, graph_type), args.formats)
+             for graph_type in args.graph_types for subject in subjects]
+
+    paths = export_figures(tasks, args.spectra, args.chemical_shifts, tuple(args.size), args.dpi, args.workers)
+    print(f"Wrote {len(paths)} files to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
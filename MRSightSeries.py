@@ -0,0 +1,83 @@
+"""Feature trajectories of a dynamic acquisition.
+
+Reads one subject's spectra over time (a .npy or .csv array of spectra on
+the dataset's chemical shift axis, one per row or column), builds a
+metabolite graph over each sliding window of frames (see
+WeightedVisibilityGraph.SpectrumSeries) and writes one row of local and
+global features per (window, graph type) to a CSV or Parquet table.
+
+Usage: python MRSightSeries.py frames.npy --output trajectories.csv [--window 4] [--step 1]
+                               [--frame-interval 2.5] [--graph-types ...]
+"""
+import argparse
+
+import numpy as np
+
+import SpectrumPreprocessing
+from MRSightBatch import GLOBAL_FEATURES, LOCAL_FEATURES, METABOLITE_GRAPH_TYPES, write_table
+
+
+def load_frames(path, points):
+    """(points, frames) spectra from a .npy or .csv file holding them as rows or columns."""
+    if path.lower().endswith('.npy'):
+        data = np.load(path, allow_pickle=False)
+    else:
+        data = np.loadtxt(path, delimiter=',', dtype=np.float64, ndmin=2)
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim == 1:
+        data = data[:, None]
+    if data.ndim != 2 or points not in data.shape:
+        raise ValueError(f"{path} holds a {data.shape} array, not spectra of {points} points")
+    return data if data.shape[0] == points else data.T
+
+
+def trajectory_rows(series, frame_interval=None):
+    """One table row per window of a SpectrumSeries."""
+    rows = []
+    for position, start in enumerate(series.starts.tolist()):
+        row = {"window": position, "first_frame": start, "last_frame": start + series.window - 1}
+        if frame_interval is not None:
+            # Centre of the window, with frame k acquired at k * frame_interval
+            row["time"] = (start + (series.window - 1) / 2) * frame_interval
+        row["graph_type"] = series.graph_type
+        row.update({name: float(series.features[name][position]) for name in GLOBAL_FEATURES})
+        for feature, attribute in LOCAL_FEATURES.items():
+            values = series.features[attribute][position]
+            row.update({f"{feature}_{symbol}": float(value) for symbol, value in zip(series.symbols, values)})
+        rows.append(row)
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compute MRSight graph features over the frames of a dynamic acquisition.")
+    parser.add_argument("frames", help="spectra over time (.npy or .csv), one per row or column")
+    parser.add_argument("--chemical-shifts", default="Datasets/chemical_shifts.csv")
+    parser.add_argument("--graph-types", nargs="+", default=METABOLITE_GRAPH_TYPES, choices=METABOLITE_GRAPH_TYPES,
+                        metavar="GRAPH_TYPE")
+    parser.add_argument("--window", type=int, default=1, help="frames averaged into each graph")
+    parser.add_argument("--step", type=int, default=1, help="frames between the starts of consecutive windows")
+    parser.add_argument("--frame-interval", type=float, help="seconds between frames, to add a time column")
+    parser.add_argument("--output", default="trajectories.csv", help="output table (.csv or .parquet)")
+    SpectrumPreprocessing.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    import WeightedVisibilityGraph
+    # Only the chemical shift axis is used; the spectra come from the frames file
+    dataset = WeightedVisibilityGraph.Dataset(chemical_shifts_path=args.chemical_shifts,
+                                              preprocessing=SpectrumPreprocessing.from_arguments(args))
+    frames = load_frames(args.frames, len(dataset.chemical_shifts_array))
+
+    rows = []
+    for graph_type in args.graph_types:
+        series = WeightedVisibilityGraph.build_series(frames, graph_type, args.window, args.step, dataset)
+        rows += trajectory_rows(series, args.frame_interval)
+    write_table(rows, args.output)
+    print(f"Wrote {len(rows)} rows ({frames.shape[1]} frames) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,11 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout,
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QIcon
 from AboutDialog import AboutDialog
+from PerformanceDialog import PerformanceDialog
 from GraphWidget import GraphWidget
+from GraphPlot import METABOLITE_COLORS as colors
+from MRSightBatch import METABOLITE_GRAPH_TYPES
+import WeightedVisibilityGraph
 
 
 class MRSightMainWindow(QMainWindow):
@@ -163,6 +167,11 @@ class MRSightMainWindow(QMainWindow):
         controls_action.triggered.connect(self.showControlsHelp)
         help_menu.addAction(controls_action)
         
+        performance_action = QAction('Performance', self)
+        performance_action.setShortcut('F3')
+        performance_action.triggered.connect(self.show_performance)
+        help_menu.addAction(performance_action)
+
         about_action = QAction('About MRSight', self)
         about_action.setShortcut('F2')
         about_action.triggered.connect(self.show_about)
@@ -195,10 +204,12 @@ class MRSightMainWindow(QMainWindow):
         primary_layout = QHBoxLayout()
         primary_label = QLabel("Primary Subject:")
         primary_label.setMinimumWidth(100)
+        # Subjects come from the spectrum store, including spectra appended since the CSV
+        subject_labels = WeightedVisibilityGraph.get_dataset().subject_labels()
         self.primary_subject_combo = QComboBox()
-        self.primary_subject_combo.addItems([f"Subject {i//2} (Time {i%2+1})" for i in range(18)])
+        self.primary_subject_combo.addItems(subject_labels)
         self.primary_subject_combo.setCurrentIndex(0)
-        self.primary_subject_combo.currentIndexChanged.connect(self.change_subject)
+        self.primary_subject_combo.currentIndexChanged.connect(self.request_subject_change)
         primary_layout.addWidget(primary_label)
         primary_layout.addWidget(self.primary_subject_combo)
         subject_layout.addLayout(primary_layout)
@@ -215,9 +226,9 @@ class MRSightMainWindow(QMainWindow):
         comparison_label = QLabel("Comparison Subject:")
         comparison_label.setMinimumWidth(100)
         self.comparison_subject_combo = QComboBox()
-        self.comparison_subject_combo.addItems([f"Subject {i//2} (Time {i%2+1})" for i in range(18)])
-        self.comparison_subject_combo.setCurrentIndex(2)
-        self.comparison_subject_combo.currentIndexChanged.connect(self.change_comparison_subject)
+        self.comparison_subject_combo.addItems(subject_labels)
+        self.comparison_subject_combo.setCurrentIndex(min(2, len(subject_labels) - 1))
+        self.comparison_subject_combo.currentIndexChanged.connect(self.request_comparison_subject_change)
         self.comparison_subject_combo.setEnabled(False)
         comparison_subject_layout.addWidget(comparison_label)
         comparison_subject_layout.addWidget(self.comparison_subject_combo)
@@ -229,9 +240,8 @@ class MRSightMainWindow(QMainWindow):
         graph_type_group = QGroupBox("Graph Type")
         graph_type_layout = QVBoxLayout()
         graph_type_combo = QComboBox()
-        graph_type_combo.addItems([
-                "Complete Metabolite Graph", "Natural Visibility Graph", "Horizontal Visibility Graph"
-                ])
+        # Full-spectrum graphs have no metabolite nodes to draw, hover or compare; the batch tools build them
+        graph_type_combo.addItems(METABOLITE_GRAPH_TYPES)
         graph_type_combo.currentTextChanged.connect(self.change_graph_type)
         graph_type_layout.addWidget(graph_type_combo)
         graph_type_group.setLayout(graph_type_layout)
@@ -256,8 +266,7 @@ class MRSightMainWindow(QMainWindow):
             row = i // 2
             col = i % 2
             self.checkboxes[metabolite] = checkbox
-            checkbox.toggled.connect(lambda: self.draw_graph())
-            checkbox.toggled.connect(lambda: self.draw_spectrum())
+            checkbox.toggled.connect(lambda: self.update_metabolite_visibility())
                         # Add color indicator
             color_indicator = QLabel()
             color_indicator.setFixedSize(16, 16)
@@ -304,15 +313,15 @@ class MRSightMainWindow(QMainWindow):
         right_widget = QWidget()
         layout = QVBoxLayout(right_widget)
 
-        self.graph_widget = GraphWidget()
-        self.spectrum_widget = GraphWidget()
+        self.graph_widget = GraphWidget("render.graph")
+        self.spectrum_widget = GraphWidget("render.spectrum")
         self.spectrum_widget.figure.tight_layout(pad=1.5)
 
         self.graph_group = QGroupBox(
-            f"Ratio-Weighted Complete Metabolite Graph - Subject {self.primary_subject_combo.currentIndex()//2} (Time {self.primary_subject_combo.currentIndex()%2+1})"
+            f"Ratio-Weighted Complete Metabolite Graph - {self.primary_subject_combo.currentText()}"
         )
         self.spectrum_group = QGroupBox(
-            f"MRS Spectrum - Subject {self.primary_subject_combo.currentIndex()//2} (Time {self.primary_subject_combo.currentIndex()%2+1})"
+            f"MRS Spectrum - {self.primary_subject_combo.currentText()}"
         )
 
         graph_layout= QVBoxLayout()
@@ -331,13 +340,17 @@ class MRSightMainWindow(QMainWindow):
     def toggleComparison(self, state):
         """Enable/disable comparison subject combo based on checkbox state"""
         self.comparison_subject_combo.setEnabled(state == Qt.Checked)
-        self.draw_graph()
+        self.toggle_comparison_mode(state == Qt.Checked)
 
 
     def show_about(self):
         dlg = AboutDialog(self)
         dlg.exec_()
 
+    def show_performance(self):
+        dlg = PerformanceDialog(self)
+        dlg.exec_()
+
     def showControlsHelp(self):
         """Show a tooltip with control instructions"""
         QToolTip.showText(
@@ -355,7 +368,7 @@ class MRSightMainWindow(QMainWindow):
             self.rect()
         )
 
-def style_global_features(subject_index, graph):
+def style_global_features(subject_label, graph):
     styled_text = f"""
         <style>
             body {{ 
@@ -389,7 +402,7 @@ def style_global_features(subject_index, graph):
                 font-weight: bold;
             }}
         </style>
-        <div class="title">Subject {subject_index//2} (Time {subject_index%2+1}) Metrics</div>
+        <div class="title">{subject_label} Metrics</div>
         <div class="metric"><span class="key">Global Efficiency:</span> <span class="value">{graph.global_efficiency:.3f}</span></div>
         <div class="metric"><span class="key">Path Length:</span> <span class="value">{graph.char_path_length:.3f}</span></div>
         <div class="metric"><span class="key">Transitivity:</span> <span class="value">{graph.undirected_transitivity_wu:.3f}</span></div>
@@ -397,20 +410,3 @@ def style_global_features(subject_index, graph):
         <div class="metric"><span class="key">Avg. Betweenness Centrality:</span> <span class="value">{graph.average_betweenness_centrality:.3f}</span></div>
     """
     return styled_text
-
-colors = {
-    "ATPα": '#FF3333',        # Bright Red
-    "ATPβ": '#33FF33',        # Bright Green
-    "ATPγ": '#FFFF33',        # Bright Yellow
-    "PCr": '#3366FF',         # Bright Blue
-    "Pi": '#FF8000',          # Bright Orange
-    "NAD+": "#D370F4",        # Bright Purple
-    "NADH": '#00FFFF',        # Bright Cyan
-    "MP": '#FF33FF',          # Bright Magenta
-    "GPC": '#CCFF00',         # Bright Lime
-    "GPE": '#FF99CC',         # Bright Pink
-    "PC (PDE)": '#00CC99',    # Bright Teal
-    "PE (PDE)": '#BB99FF',    # Bright Lavender
-    "DPG_d": '#FF9966',       # Bright Coral
-    "DPG_t": '#FFB700',       # Bright Amber
-}
\ No newline at end of file
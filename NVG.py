@@ -0,0 +1,84 @@
+import numpy as np
+
+
+def visible_points(x, y, peak, candidates):
+    """Candidates seen from the peak, scanning outward from it.
+
+    A point is visible when its slope from the peak beats the slope of every
+    point between them, so one running maximum settles the whole scan.
+    """
+    slopes = (y[candidates] - y[peak]) / np.abs(x[candidates] - x[peak])
+    blocking = np.empty_like(slopes)
+    blocking[0] = -np.inf
+    np.maximum.accumulate(slopes[:-1], out=blocking[1:])
+    return candidates[slopes > blocking]
+
+
+def natural_visibility_edges(series, positions=None):
+    """Edges (i, j), i < j, of the natural visibility graph as an (E, 2) array.
+
+    Divide and conquer on the maximum: the highest point of a segment blocks
+    every line of sight across it, so it is only tested against its own
+    segment before both halves are solved independently. O(n log n) on
+    average, O(n^2) for monotone series. Positions default to the sample
+    index, like the visibility_graph package.
+    """
+    y = np.asarray(series, dtype=np.float64)
+    n = len(y)
+    x = np.arange(n, dtype=np.float64) if positions is None else np.asarray(positions, dtype=np.float64)
+
+    sources, targets = [], []
+    segments = [(0, n)]
+    while segments:
+        low, high = segments.pop()
+        if high - low < 2:
+            continue
+        peak = low + int(np.argmax(y[low:high]))
+        if peak + 1 < high:
+            right = visible_points(x, y, peak, np.arange(peak + 1, high))
+            sources.append(np.full(len(right), peak))
+            targets.append(right)
+        if peak > low:
+            left = visible_points(x, y, peak, np.arange(peak - 1, low - 1, -1))
+            sources.append(left)
+            targets.append(np.full(len(left), peak))
+        segments.append((low, peak))
+        segments.append((peak + 1, high))
+
+    if not sources:
+        return np.empty((0, 2), dtype=np.intp)
+    edges = np.column_stack((np.concatenate(sources), np.concatenate(targets))).astype(np.intp)
+    return edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+
+
+def natural_visibility_masks(series):
+    """Batched natural visibility: (..., n) series to (..., n, n) masks, True at visible (i, j), i < j.
+
+    Same slope test as visible_points, scanning right from every i at once.
+    Positions are the sample index; O(n^2) per series.
+    """
+    y = np.asarray(series, dtype=np.float64)
+    n = y.shape[-1]
+    offsets = np.arange(n)[None, :] - np.arange(n)[:, None]
+    ahead = offsets > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slopes = np.where(ahead, (y[..., None, :] - y[..., :, None]) / np.where(ahead, offsets, 1), -np.inf)
+    blocking = np.full(slopes.shape, -np.inf)
+    blocking[..., 1:] = np.maximum.accumulate(slopes[..., :-1], axis=-1)
+    return ahead & (slopes > blocking)
+
+
+def edges_to_adjacency(edges, n, weights=None):
+    """Symmetric scipy.sparse CSR adjacency matrix for an (E, 2) edge array."""
+    from scipy import sparse
+
+    edges = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+    weights = np.ones(len(edges)) if weights is None else np.asarray(weights, dtype=np.float64)
+    rows = np.concatenate((edges[:, 0], edges[:, 1]))
+    columns = np.concatenate((edges[:, 1], edges[:, 0]))
+    return sparse.csr_matrix((np.concatenate((weights, weights)), (rows, columns)), shape=(n, n))
+
+
+def natural_visibility_adjacency(series, positions=None):
+    """Unweighted natural visibility graph as a scipy.sparse CSR matrix."""
+    return edges_to_adjacency(natural_visibility_edges(series, positions), len(series))
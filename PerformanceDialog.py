@@ -0,0 +1,76 @@
+import json
+
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget,
+                             QTableWidgetItem, QTextEdit, QFileDialog, QHeaderView, QLabel)
+from PyQt5.QtCore import Qt
+
+from PerformanceMetrics import registry
+
+SPARK_LEVELS = " ▁▂▃▄▅▆▇█"
+COLUMNS = ["Stage", "Count", "Mean (ms)", "p50 (ms)", "p95 (ms)", "Max (ms)", "Total (ms)", "Distribution"]
+
+
+def sparkline(buckets):
+    """One character per histogram bucket, scaled to the fullest one."""
+    counts = list(buckets.values())
+    peak = max(counts) or 1
+    return "".join(SPARK_LEVELS[0 if count == 0 else max(1, round(count / peak * (len(SPARK_LEVELS) - 1)))]
+                   for count in counts)
+
+
+class PerformanceDialog(QDialog):
+    """Stage timings and component counters from the metrics registry."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("MRSight Performance")
+        self.resize(900, 600)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Stage durations since start or the last reset "
+                                "(distribution buckets from 0.1 ms to over 5 s):"))
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        layout.addWidget(self.table, 3)
+
+        layout.addWidget(QLabel("Counters:"))
+        self.sources_text = QTextEdit()
+        self.sources_text.setReadOnly(True)
+        layout.addWidget(self.sources_text, 2)
+
+        buttons = QHBoxLayout()
+        for text, slot in (("Refresh", self.refresh), ("Reset", self.reset),
+                           ("Save JSON...", self.save_json), ("Close", self.accept)):
+            button = QPushButton(text)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+
+        self.refresh()
+
+    def refresh(self):
+        snapshot = registry.snapshot()
+        self.table.setRowCount(len(snapshot["stages"]))
+        for row, (name, summary) in enumerate(snapshot["stages"].items()):
+            values = [name, str(summary["count"])]
+            values += [f"{summary[key]:.2f}" for key in ("mean_ms", "p50_ms", "p95_ms", "max_ms", "total_ms")]
+            values.append(sparkline(summary["buckets"]))
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if 0 < column < len(values) - 1:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+        self.sources_text.setPlainText(json.dumps(snapshot["sources"], indent=2, default=str))
+
+    def reset(self):
+        registry.reset()
+        self.refresh()
+
+    def save_json(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save performance metrics", "mrsight-metrics.json",
+                                              "JSON files (*.json)")
+        if path:
+            registry.dump(path)
@@ -0,0 +1,161 @@
+"""In-process stage timers for graph builds and rendering.
+
+Wrap a stage with ``with stage("graph.create_edges"):`` or decorate it with
+``@timed("ui.draw_graph")``; every run is recorded in the shared `registry`
+as a histogram of durations. Other components register callables returning
+their own counters (cache hits, dropped events, ...) so that one snapshot
+holds everything, for the Performance dialog or as JSON.
+
+Environment variables:
+    MRSIGHT_PROFILE=<stage>      run the next execution of <stage> under cProfile
+                                 (a name prefix such as "ui." works; "1" takes the
+                                 first stage to run) and write the stats to
+                                 mrsight-<stage>.prof, or MRSIGHT_PROFILE_OUTPUT
+    MRSIGHT_METRICS_DUMP=<path>  write the registry as JSON when MRSight exits
+"""
+import bisect
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bucket bounds in milliseconds; the last bucket takes everything slower
+BUCKET_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+RECENT_SAMPLES = 1024
+
+
+class Histogram:
+    """Durations of one stage: fixed log-spaced buckets plus the latest samples for percentiles."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = float("inf")
+        self.max_ms = 0.0
+
+    def add(self, milliseconds):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, milliseconds)] += 1
+        self.recent.append(milliseconds)
+        self.count += 1
+        self.total_ms += milliseconds
+        self.min_ms = min(self.min_ms, milliseconds)
+        self.max_ms = max(self.max_ms, milliseconds)
+
+    def percentile(self, q):
+        """Percentile of the latest samples, in milliseconds."""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total_ms,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "min_ms": self.min_ms if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "max_ms": self.max_ms,
+            "last_ms": self.recent[-1] if self.recent else 0.0,
+            "buckets": dict(zip([f"<={bound}" for bound in BUCKET_BOUNDS_MS] + [f">{BUCKET_BOUNDS_MS[-1]}"],
+                                self.buckets)),
+        }
+
+
+class MetricsRegistry:
+    """Stage histograms and counter sources, safe to record into from worker threads."""
+
+    def __init__(self, profile_target=None, profile_output=None):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.sources = {}
+        # One-shot cProfile capture, disarmed as soon as a matching stage starts
+        self.profile_target = profile_target
+        self.profile_output = profile_output
+        self.profile_path = None
+
+    def record(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds * 1e3)
+
+    @contextmanager
+    def stage(self, name):
+        profiler = self.claim_profile(name)
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            self.record(name, time.perf_counter() - start)
+            if profiler is not None:
+                self.write_profile(name, profiler)
+
+    def timed(self, name):
+        """Decorator form of `stage`."""
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def claim_profile(self, name):
+        if self.profile_target is None:
+            return None
+        with self.lock:
+            target = self.profile_target
+            if target is None or not (target == "1" or name.startswith(target)):
+                return None
+            self.profile_target = None
+        # Imported only when profiling: pstats alone costs more than the rest of this module
+        import cProfile
+        return cProfile.Profile()
+
+    def write_profile(self, name, profiler):
+        self.profile_path = self.profile_output or f"mrsight-{name}.prof"
+        profiler.dump_stats(self.profile_path)
+        print(f"Profiled {name} into {self.profile_path}", file=sys.stderr)
+        import pstats
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(20)
+
+    def register_source(self, name, stats):
+        """Include `stats()` (a JSON-serialisable dict) in every snapshot under `name`."""
+        with self.lock:
+            self.sources[name] = stats
+
+    def snapshot(self):
+        with self.lock:
+            stages = {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+            sources = dict(self.sources)
+        return {"stages": stages, "sources": {name: stats() for name, stats in sources.items()}}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, default=str)
+
+    def dump(self, path):
+        with open(path, "w") as file:
+            file.write(self.to_json())
+
+    def reset(self):
+        """Forget recorded durations; registered sources keep their own counters."""
+        with self.lock:
+            self.histograms.clear()
+
+
+registry = MetricsRegistry(os.environ.get("MRSIGHT_PROFILE") or None, os.environ.get("MRSIGHT_PROFILE_OUTPUT"))
+stage = registry.stage
+timed = registry.timed
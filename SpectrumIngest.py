@@ -0,0 +1,76 @@
+"""Append newly acquired spectra to the dataset without rebuilding it.
+
+Each file holds one subject's spectrum (.npy, or a single-row or
+single-column .csv) on the dataset's chemical shift axis. Files are appended
+to the spectrum store as new subjects, and when a feature index exists only
+the new subjects' features are computed and added to it.
+
+Usage:
+    python SpectrumIngest.py scan_001.npy scan_002.csv
+    python SpectrumIngest.py --directory Datasets/incoming   # every file not yet ingested
+"""
+import argparse
+import os
+
+from SpectrumStore import SPECTRUM_EXTENSIONS, load_spectrum
+
+INCOMING_DIR = 'Datasets/incoming'
+
+
+def pending_files(directory, dataset):
+    """Spectrum files in `directory` that are not in the store yet, in name order."""
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return []
+    store = dataset.spectrum_store
+    paths = [os.path.join(directory, name) for name in names if name.lower().endswith(SPECTRUM_EXTENSIONS)]
+    return [path for path in paths if os.path.isfile(path) and not store.is_ingested(path)]
+
+
+def ingest_files(paths, dataset=None, update_index=True, workers=1):
+    """Append each file as a new subject and return the new subject ids.
+
+    Files already ingested and unchanged are skipped. A file that cannot be
+    read raises before anything after it is appended.
+    """
+    import WeightedVisibilityGraph
+
+    dataset = dataset if dataset is not None else WeightedVisibilityGraph.get_dataset()
+    store = dataset.spectrum_store
+    subject_ids = []
+    for path in paths:
+        if store.is_ingested(path):
+            continue
+        subject_ids.append(store.append(load_spectrum(path), path))
+
+    index = dataset.feature_index if update_index and subject_ids else None
+    if index is not None:
+        from FeatureIndex import default_index_path
+        index.extend(dataset, subject_ids, workers)
+        index.save(dataset.feature_index_path or default_index_path(dataset))
+    return subject_ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append new spectra to the MRSight dataset.")
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--directory", help=f"ingest every new spectrum file here (e.g. {INCOMING_DIR})")
+    parser.add_argument("--spectra", default="Datasets/spectra.csv")
+    parser.add_argument("--chemical-shifts", default="Datasets/chemical_shifts.csv")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    import WeightedVisibilityGraph
+
+    dataset = WeightedVisibilityGraph.use_dataset(args.spectra, args.chemical_shifts)
+    paths = list(args.files) + (pending_files(args.directory, dataset) if args.directory else [])
+    subject_ids = ingest_files(paths, dataset, workers=args.workers)
+    labels = dataset.subject_labels()
+    for subject_id in subject_ids:
+        print(f"Subject {subject_id}: {labels[subject_id]}")
+    print(f"Ingested {len(subject_ids)} spectra; the dataset now has {dataset.subject_count} subjects")
+
+
+if __name__ == "__main__":
+    main()
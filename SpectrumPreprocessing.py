@@ -0,0 +1,227 @@
+"""Baseline correction, smoothing and peak quantification ahead of node creation.
+
+A SpectrumPreprocessing is one parameter set. It turns (points, subjects)
+spectra into (metabolites, subjects) peak values, vectorised over the
+subjects:
+
+* baseline: a polynomial of `baseline_order` over the whole axis, fitted by
+  modified polyfit (the spectrum is clipped to the fit and refitted, so
+  peaks stop pulling the baseline up) and subtracted;
+* smoothing: a Savitzky-Golay filter over `smoothing_window` points;
+* peaks: the value at the point nearest each metabolite shift ("nearest",
+  what Graph always used), the area within `peak_width` ppm of it ("area"),
+  or the height of a fitted Lorentzian ("lorentzian"). Metabolites whose
+  ±`peak_width` windows overlap (NAD+, NADH and ATPα, for example) are
+  fitted together, as a sum of Lorentzians over a constant offset, with
+  each centre within `max_shift` ppm of its tabulated shift.
+
+The full-spectrum graphs use the baseline correction and smoothing only
+(see WeightedVisibilityGraph.Dataset.corrected_spectra).
+
+Datasets cache the peaks of every subject per parameter set (see
+WeightedVisibilityGraph.Dataset.metabolite_intensities), so graphs are
+rebuilt and redrawn without fitting again.
+"""
+import numpy as np
+
+from PerformanceMetrics import timed
+
+PEAK_METHODS = ("nearest", "area", "lorentzian")
+# numpy 2 renamed trapz, and later releases dropped the old name
+trapezoid = np.trapezoid if hasattr(np, "trapezoid") else np.trapz
+
+
+class SpectrumPreprocessing:
+    # Subjects processed at a time, bounding the temporary arrays for large cohorts
+    CHUNK = 1024
+    # Levenberg-Marquardt iterations of the Lorentzian fits
+    FIT_ITERATIONS = 50
+
+    def __init__(self, baseline_order=None, baseline_iterations=20, smoothing_window=None, smoothing_order=2,
+                 peaks="nearest", peak_width=0.3, max_shift=0.1):
+        if peaks not in PEAK_METHODS:
+            raise ValueError(f"Unknown peak method: {peaks}")
+        if smoothing_window is not None and (smoothing_window <= smoothing_order or smoothing_window % 2 == 0):
+            raise ValueError("The smoothing window must be an odd number of points above the smoothing order")
+        if peak_width <= 0 or max_shift < 0:
+            raise ValueError("The peak width must be positive and the maximum shift not negative")
+        self.baseline_order = baseline_order
+        self.baseline_iterations = baseline_iterations
+        self.smoothing_window = smoothing_window
+        self.smoothing_order = smoothing_order
+        self.peaks = peaks
+        self.peak_width = peak_width
+        self.max_shift = max_shift
+
+    @property
+    def key(self):
+        return (self.baseline_order, self.baseline_iterations, self.smoothing_window, self.smoothing_order,
+                self.peaks, self.peak_width, self.max_shift)
+
+    def __eq__(self, other):
+        return isinstance(other, SpectrumPreprocessing) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return (f"SpectrumPreprocessing(baseline_order={self.baseline_order!r}, smoothing_window={self.smoothing_window!r}, "
+                f"peaks={self.peaks!r}, peak_width={self.peak_width!r}, max_shift={self.max_shift!r})")
+
+    def correct(self, spectra, shifts):
+        """Baseline-corrected and smoothed copy of (points, subjects) spectra."""
+        spectra = np.array(spectra, dtype=np.float64)
+        if self.baseline_order is not None:
+            spectra -= self.baseline(spectra, shifts)
+        if self.smoothing_window is not None:
+            from scipy.signal import savgol_filter
+            spectra = savgol_filter(spectra, self.smoothing_window, self.smoothing_order, axis=0)
+        return spectra
+
+    def baseline(self, spectra, shifts):
+        """Modified polyfit baseline of every column. The design matrix is shared, so each pass is one product."""
+        axis = np.asarray(shifts, dtype=np.float64)
+        # Scaled to [-1, 1] to keep the Vandermonde matrix well conditioned
+        scaled = (2 * axis - axis.max() - axis.min()) / ((axis.max() - axis.min()) or 1.0)
+        design = np.vander(scaled, self.baseline_order + 1)
+        projection = np.linalg.pinv(design)
+        clipped = spectra
+        for _ in range(self.baseline_iterations):
+            fit = design @ (projection @ clipped)
+            clipped = np.minimum(clipped, fit)
+        return design @ (projection @ clipped)
+
+    @timed("preprocess.peaks")
+    def peak_intensities(self, spectra, shifts, indices):
+        """(metabolites, subjects) peak values of (points, subjects) spectra, metabolites at the given axis points."""
+        spectra = np.asarray(spectra, dtype=np.float64).reshape(len(shifts), -1)
+        indices = np.asarray(indices, dtype=np.intp)
+        return np.concatenate([self.chunk_peaks(spectra[:, start:start + self.CHUNK], shifts, indices)
+                               for start in range(0, max(spectra.shape[1], 1), self.CHUNK)], axis=1)
+
+    def chunk_peaks(self, spectra, shifts, indices):
+        shifts = np.asarray(shifts, dtype=np.float64)
+        corrected = self.correct(spectra, shifts)
+        if self.peaks == "nearest":
+            return corrected[indices]
+
+        # The same number of points on either side of every metabolite; the axis is evenly spaced
+        spacing = np.abs(shifts[1] - shifts[0]) if len(shifts) > 1 else 1.0
+        half = max(int(round(self.peak_width / spacing)), 1)
+        if self.peaks == "area":
+            windows = np.clip(indices[:, None] + np.arange(-half, half + 1), 0, len(shifts) - 1)
+            y = np.moveaxis(corrected[windows], -1, 0)            # (subjects, metabolites, points)
+            # Trapezoid rule, positive whichever way the axis runs
+            return np.abs(trapezoid(y, shifts[windows], axis=-1)).T
+        return self.fit_lorentzians(corrected, shifts, indices, half, spacing)
+
+    def fit_groups(self, indices, half):
+        """Metabolites (positions in `indices`) whose ±half-point windows overlap, grouped in axis order."""
+        order = np.argsort(indices, kind='stable')
+        groups = [[order[0]]]
+        for previous, current in zip(order[:-1], order[1:]):
+            if indices[current] - indices[previous] <= 2 * half:
+                groups[-1].append(current)
+            else:
+                groups.append([current])
+        return groups
+
+    def fit_lorentzians(self, corrected, shifts, indices, half, spacing):
+        """Fitted heights, (metabolites, subjects), of every metabolite in every corrected spectrum.
+
+        Each group of overlapping metabolites is one model, a sum of
+        h / (1 + ((x - c) / w)^2) plus a constant, fitted over the union of
+        their windows. Groups of the same size are fitted together, for all
+        subjects at once. A fit that ends on a bound of its height, centre or
+        width did not find its peak; its metabolite gets the corrected value
+        at the nearest point instead.
+        """
+        heights = np.empty((len(indices), corrected.shape[1]))
+        groups = self.fit_groups(indices, half)
+        for size in sorted({len(group) for group in groups}):
+            members = np.array([group for group in groups if len(group) == size])        # (groups, peaks)
+            heights[members] = np.moveaxis(self.fit_group_batch(corrected, shifts, indices[members], half, spacing), 0, -1)
+        return heights
+
+    def fit_group_batch(self, corrected, shifts, members, half, spacing):
+        """(subjects, groups, peaks) heights for groups of equally many metabolites at the axis points `members`."""
+        first = np.maximum(members.min(axis=1) - half, 0)
+        last = np.minimum(members.max(axis=1) + half, len(shifts) - 1)
+        points = np.arange((last - first).max() + 1)
+        # Windows of one batch can differ in length; the points past a window's end are masked out
+        valid = points[None, :] <= (last - first)[:, None]                                 # (groups, points)
+        rows = np.minimum(first[:, None] + points, last[:, None])
+        x = shifts[rows][:, None, :]                                                       # (groups, 1, points)
+        y = np.moveaxis(corrected[rows], -1, 0) * valid                                    # (subjects, groups, points)
+        nearest = np.moveaxis(corrected[members], -1, 0)                                   # (subjects, groups, peaks)
+
+        table = shifts[members]
+        low = np.concatenate([np.zeros_like(table), table - self.max_shift, np.full_like(table, spacing / 2),
+                              np.full(table.shape[:1] + (1,), -np.inf)], axis=-1)
+        high = np.concatenate([np.full_like(table, np.inf), table + self.max_shift, np.full_like(table, self.peak_width),
+                               np.full(table.shape[:1] + (1,), np.inf)], axis=-1)
+        # Heights start from the nearest points above the window's lowest point, which starts the offset
+        offset = np.where(valid, y, np.inf).min(axis=-1, keepdims=True)
+        params = np.concatenate([nearest - offset, np.broadcast_to(table, nearest.shape),
+                                 np.full(nearest.shape, 2 * spacing), offset], axis=-1)
+        params = np.clip(params, low, high)
+
+        def evaluate(params):
+            height, centre, width = np.split(params[..., :-1], 3, axis=-1)
+            u = (x - centre[..., None]) / width[..., None]                                # (..., peaks, points)
+            d = 1 + u ** 2
+            residuals = ((height[..., None] / d).sum(axis=-2) + params[..., -1:] - y) * valid
+            return residuals, (residuals ** 2).sum(axis=-1)
+
+        residuals, cost = evaluate(params)
+        damping = np.full(cost.shape, 1e-3)
+        for _ in range(self.FIT_ITERATIONS):
+            height, centre, width = (part[..., None] for part in np.split(params[..., :-1], 3, axis=-1))
+            u = (x - centre) / width
+            d = 1 + u ** 2
+            slope = height * 2 * u / (width * d ** 2)
+            jacobian = np.concatenate([1 / d, slope, slope * u, np.ones(u.shape[:-2] + (1, u.shape[-1]))], axis=-2)
+            jacobian = jacobian * valid[:, None, :]                                        # (..., params, points)
+            jtj = np.einsum('...ip,...jp->...ij', jacobian, jacobian)
+            jtr = np.einsum('...ip,...p->...i', jacobian, residuals)
+            diagonal = np.diagonal(jtj, axis1=-2, axis2=-1)
+            # A zero-height peak has empty centre and width columns; a unit diagonal keeps the system solvable
+            damped = jtj + (damping[..., None] * diagonal + (diagonal == 0))[..., None, :] * np.eye(jtj.shape[-1])
+            step = np.linalg.solve(damped, -jtr[..., None])[..., 0]
+            trial = np.clip(params + step, low, high)
+
+            trial_residuals, trial_cost = evaluate(trial)
+            better = trial_cost < cost
+            improvement = np.where(better, cost - trial_cost, 0.0)
+            params = np.where(better[..., None], trial, params)
+            residuals = np.where(better[..., None], trial_residuals, residuals)
+            cost = np.where(better, trial_cost, cost)
+            damping = np.where(better, damping / 10, damping * 10)
+            # Done when no fit still improves, or can only take ever smaller steps
+            if np.all((improvement <= 1e-10 * cost) & (better | (damping > 1e3))):
+                break
+
+        height, centre, width = np.split(params[..., :-1], 3, axis=-1)
+        tolerance = 1e-3 * spacing
+        on_bound = ((height <= 0) | (np.abs(centre - table) >= self.max_shift - tolerance) |
+                    (width >= self.peak_width - tolerance) | (width <= spacing / 2 + tolerance))
+        return np.where(on_bound, nearest, height)
+
+
+def add_arguments(parser):
+    """Command-line options for a SpectrumPreprocessing, shared by the batch tools."""
+    group = parser.add_argument_group("preprocessing")
+    group.add_argument("--baseline-order", type=int, help="subtract a polynomial baseline of this order")
+    group.add_argument("--smoothing-window", type=int, help="Savitzky-Golay smoothing over this many points (odd)")
+    group.add_argument("--peaks", default="nearest", choices=PEAK_METHODS,
+                       help="metabolite value: nearest point, area or fitted Lorentzian height")
+    group.add_argument("--peak-width", type=float, default=0.3, help="ppm either side of a metabolite for area and fits")
+    group.add_argument("--max-shift", type=float, default=0.1, help="ppm a fitted peak centre may move from its table value")
+
+
+def from_arguments(args):
+    """The SpectrumPreprocessing the options ask for, or None for raw nearest-point peaks."""
+    if args.baseline_order is None and args.smoothing_window is None and args.peaks == "nearest":
+        return None
+    return SpectrumPreprocessing(baseline_order=args.baseline_order, smoothing_window=args.smoothing_window,
+                                 peaks=args.peaks, peak_width=args.peak_width, max_shift=args.max_shift)
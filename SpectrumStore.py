@@ -0,0 +1,176 @@
+import json
+import os
+import numpy as np
+
+STORE_VERSION = 1
+CACHE_DIR_NAME = '.cache'
+SPECTRUM_EXTENSIONS = ('.csv', '.npy')
+
+
+def load_spectrum(path):
+    """One subject's spectrum from a .npy file or a single-row or single-column .csv."""
+    if path.lower().endswith('.npy'):
+        data = np.load(path, allow_pickle=False)
+    else:
+        data = np.loadtxt(path, delimiter=',', dtype=np.float64)
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim > 1 and sorted(data.shape)[-2] != 1:
+        raise ValueError(f"{path} holds a {data.shape} array, not one spectrum")
+    return data.ravel()
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+class SpectrumStore:
+    """Binary, memory-mapped copy of a spectra CSV.
+
+    The CSV is parsed once and written as raw float64 in column-major order,
+    so every subject's spectrum is one contiguous block on disk, next to a
+    small JSON header. Later runs open the block with ``np.memmap`` and only
+    touch the pages of the columns they read. The cache is rebuilt whenever
+    the CSV's mtime or size changes, and the CSV is used directly if the
+    cache cannot be written.
+
+    Spectra acquired later are appended as new last columns (`append`); the
+    header lists where each came from, so they survive restarts and are
+    appended again if the CSV itself changes.
+    """
+
+    def __init__(self, csv_path, cache_dir=None, data=None):
+        self.csv_path = csv_path
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(csv_path) or '.', CACHE_DIR_NAME)
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        self.data_path = os.path.join(self.cache_dir, f"{name}.f64")
+        self.header_path = os.path.join(self.cache_dir, f"{name}.json")
+        self.ingested = []
+        # Given `data` (e.g. synthetic spectra) is stored as if parsed from the CSV, which need not exist
+        self.array = self.open() if data is None else self.create(data)
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    def column(self, index):
+        """Return one subject's spectrum without loading the others."""
+        return self.array[:, index]
+
+    @property
+    def source_columns(self):
+        """Number of subjects parsed from the CSV; appended ones follow them."""
+        return self.shape[1] - len(self.ingested)
+
+    def source_signature(self):
+        return file_signature(self.csv_path)
+
+    def read_header(self):
+        try:
+            with open(self.header_path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, header):
+        if header is None or header.get("version") != STORE_VERSION:
+            return False
+        if not os.path.exists(self.data_path):
+            return False
+        return header.get("source") == self.source_signature()
+
+    def open(self):
+        header = self.read_header()
+        if not os.path.exists(self.csv_path) and header is not None:
+            return self.map(header)
+
+        if self.is_fresh(header):
+            return self.map(header)
+
+        data = np.loadtxt(self.csv_path, delimiter=',', dtype=np.float64)
+        try:
+            self.build(data)
+        except OSError:
+            # Read-only dataset directory: keep working from the parsed CSV
+            return data
+        self.array = self.map(self.read_header())
+
+        # The CSV changed under appended spectra: append them again from their files
+        for entry in (header or {}).get("ingested", []):
+            if entry.get("path") and os.path.exists(entry["path"]):
+                self.append(load_spectrum(entry["path"]), entry["path"], entry.get("label"))
+        return self.array
+
+    def create(self, data):
+        self.build(np.asarray(data, dtype=np.float64))
+        return self.map(self.read_header())
+
+    def build(self, data):
+        """Write the binary block and header, replacing any stale cache."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temporary_path = self.data_path + '.tmp'
+        np.asfortranarray(data).ravel(order='F').tofile(temporary_path)
+        os.replace(temporary_path, self.data_path)
+
+        header = {
+            "version": STORE_VERSION,
+            "dtype": "float64",
+            "order": "F",
+            "shape": list(data.shape),
+            "source": self.source_signature() if os.path.exists(self.csv_path) else None,
+        }
+        self.write_header(header)
+
+    def write_header(self, header):
+        """Replace the header atomically, so an interrupted write never leaves a truncated one."""
+        temporary_path = self.header_path + '.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump(header, file, indent=2)
+        os.replace(temporary_path, self.header_path)
+
+    def is_ingested(self, path):
+        """Whether this file, unchanged since, has already been appended."""
+        path = os.path.abspath(path)
+        signature = file_signature(path)
+        return any(entry.get("path") == path and entry.get("source") == signature for entry in self.ingested)
+
+    def append(self, spectrum, path=None, label=None):
+        """Add one subject's spectrum as the new last column and return its index.
+
+        Only the new column is written: the existing block is extended in place
+        and the header rewritten, so earlier subjects are neither reparsed nor
+        copied.
+        """
+        spectrum = np.asarray(spectrum, dtype=np.float64).ravel()
+        if len(spectrum) != self.shape[0]:
+            raise ValueError(f"Spectrum has {len(spectrum)} points, the store has {self.shape[0]}")
+        path = os.path.abspath(path) if path else None
+        entry = {
+            "path": path,
+            "label": label or (os.path.splitext(os.path.basename(path))[0] if path else f"Subject {self.shape[1]}"),
+            "source": file_signature(path) if path else None,
+        }
+
+        header = self.read_header()
+        if not isinstance(self.array, np.memmap) or header is None:
+            self.array = np.column_stack((self.array, spectrum))
+            self.ingested.append(entry)
+            return self.shape[1] - 1
+
+        # Column-major: a new column is a block at the end of the file. Bytes past
+        # the header's shape are left over from an interrupted append.
+        rows, columns = header["shape"]
+        with open(self.data_path, 'r+b') as file:
+            file.truncate(rows * columns * np.dtype(header["dtype"]).itemsize)
+            file.seek(0, os.SEEK_END)
+            spectrum.astype(header["dtype"]).tofile(file)
+        header["shape"] = [rows, columns + 1]
+        header["ingested"] = header.get("ingested", []) + [entry]
+        self.write_header(header)
+        self.array = self.map(header)
+        return columns
+
+    def map(self, header):
+        self.ingested = list(header.get("ingested", []))
+        return np.memmap(self.data_path, dtype=np.dtype(header["dtype"]), mode='r',
+                         shape=tuple(header["shape"]), order=header["order"])
@@ -0,0 +1,96 @@
+import os
+
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QRunnable, QThreadPool, pyqtSignal
+
+from EventCoalescer import EventCoalescer
+from SpectrumIngest import ingest_files, pending_files
+
+
+class SpectrumScanSignals(QObject):
+    finished = pyqtSignal(list)
+    failed = pyqtSignal(str, str)
+
+
+class SpectrumScanTask(QRunnable):
+    """Ingest the new files of a directory on a pool thread and report back through Qt signals."""
+
+    def __init__(self, directory, dataset):
+        super().__init__()
+        self.directory = directory
+        self.dataset = dataset
+        # Created on the GUI thread, so the emits below are queued to it
+        self.signals = SpectrumScanSignals()
+
+    def run(self):
+        # One file at a time, so a bad file does not block the rest
+        subject_ids = []
+        for path in pending_files(self.directory, self.dataset):
+            try:
+                subject_ids += ingest_files([path], self.dataset)
+            except (OSError, ValueError) as error:
+                self.signals.failed.emit(path, f"{type(error).__name__}: {error}")
+        self.signals.finished.emit(subject_ids)
+
+
+class SpectrumWatcher(QObject):
+    """Ingest spectrum files dropped into a directory while the application runs.
+
+    Directory changes are debounced, so a file still being copied in is read
+    once its writes have settled; a file that cannot be read yet is retried
+    on the next change. Files are appended, and their features indexed, on a
+    worker thread, one scan at a time; new subjects are reported on the GUI
+    thread through `subjects_added`.
+    """
+
+    subjects_added = pyqtSignal(list)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, directory, dataset, interval_ms=500, parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        self.dataset = dataset
+        self.ingested = 0
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        # The running scan, kept referenced until it reports back, and whether the directory changed since it started
+        self.task = None
+        self.rescan = False
+        self.scans = EventCoalescer(self.scan, interval_ms, debounce=True, parent=self)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.scans.submit)
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            # Read-only dataset directory: nothing can be dropped in to watch for
+            return
+        self.watcher.addPath(directory)
+        # Files that arrived while the application was closed; the scan runs from the event loop,
+        # after the owner has connected subjects_added
+        self.scans.submit()
+
+    def scan(self, *_):
+        """Start ingesting the new files on the worker thread, or once more after the running scan."""
+        if self.task is not None:
+            self.rescan = True
+            return
+        self.task = SpectrumScanTask(self.directory, self.dataset)
+        self.task.setAutoDelete(False)
+        self.task.signals.finished.connect(self.on_scanned)
+        self.task.signals.failed.connect(self.failed)
+        self.pool.start(self.task)
+
+    def on_scanned(self, subject_ids):
+        self.task = None
+        if subject_ids:
+            self.ingested += len(subject_ids)
+            self.subjects_added.emit(subject_ids)
+        if self.rescan:
+            self.rescan = False
+            self.scan()
+
+    def is_busy(self):
+        return self.task is not None
+
+    def wait(self, msecs=-1):
+        """Block until the running scan finishes; its results still arrive through the event loop."""
+        return self.pool.waitForDone(msecs)
@@ -1,8 +1,13 @@
+import bisect
+import threading
+
 import numpy as np
 import chemical_shifts
-import bct
-from HVG import horizontal_visibility_graph
-from visibility_graph import visibility_graph
+from SpectrumStore import SpectrumStore
+from HVG import horizontal_visibility_edges, horizontal_visibility_masks
+from NVG import natural_visibility_edges, natural_visibility_masks, edges_to_adjacency
+from GraphMetrics import graph_metrics, invert, label_setting_distances
+from PerformanceMetrics import timed
 
 # Constants
 MIN_THICKNESS = 1.2
@@ -10,22 +15,234 @@ MAX_THICKNESS = 4
 MIN_ALPHA = 0.51
 MAX_ALPHA = 1.0
 
-# Load data
-spectra = np.loadtxt('Datasets/spectra.csv', delimiter=',', dtype=np.float64)
-chemical_shifts_array = np.loadtxt('Datasets/chemical_shifts.csv', delimiter=',', dtype=np.float64)
+# Metabolite graph edges: node positions in Graph.nodes plus the drawing attributes
+EDGE_DTYPE = np.dtype([
+    ("source", np.intp), ("target", np.intp), ("weight", np.float64),
+    ("weight_normalized", np.float64), ("linewidth", np.float64), ("alpha", np.float64),
+])
+
+# Natural visibility graph engines: built-in divide and conquer, or the visibility_graph package
+NVG_ENGINES = ("divide-and-conquer", "visibility_graph")
+
+# Metabolite graph feature engines: vectorised GraphMetrics, or the original bct calls
+METRICS_ENGINES = ("vectorised", "bct")
+
+# Graph types built over every chemical-shift point instead of the metabolite peaks
+FULL_SPECTRUM_GRAPH_TYPES = ("full-spectrum natural visibility graph", "full-spectrum horizontal visibility graph")
+
+# Graph attributes of one kind of graph, cleared when a Graph changes to the other kind
+METABOLITE_FEATURES = ("undirected_strengths", "undirected_betweenness_centralities", "undirected_clustering_coefs",
+                       "local_efficiency", "global_efficiency", "char_path_length", "undirected_transitivity_wu",
+                       "average_local_efficiency", "average_betweenness_centrality")
+SPECTRUM_ATTRIBUTES = ("spectrum_indices", "spectrum_shifts", "spectrum_intensities", "spectrum_edges",
+                       "spectrum_adjacency", "spectrum_degrees", "spectrum_strengths", "spectrum_clustering_coefs",
+                       "average_degree", "average_strength", "average_clustering_coef")
+
+SPECTRA_PATH = 'Datasets/spectra.csv'
+CHEMICAL_SHIFTS_PATH = 'Datasets/chemical_shifts.csv'
+
 metabolite_shifts = chemical_shifts.chemical_shifts
+metabolite_symbols = [details['symbol'] for details in metabolite_shifts.values()]
+metabolite_shift_values = np.array([details['value'] for details in metabolite_shifts.values()], dtype=np.float64)
+
+
+def dense_ranks(values):
+    """Rank of every value within its row, equal values sharing a rank, as an int array of the same shape."""
+    values = np.asarray(values)
+    order = np.argsort(values, axis=-1, kind='stable')
+    ordered = np.take_along_axis(values, order, axis=-1)
+    steps = np.zeros(values.shape, dtype=np.intp)
+    steps[..., 1:] = np.cumsum(ordered[..., 1:] > ordered[..., :-1], axis=-1)
+    ranks = np.empty_like(steps)
+    np.put_along_axis(ranks, order, steps, axis=-1)
+    return ranks
+
+
+def nearest_indices(axis, values):
+    """Index of the axis point nearest each value, ties going to the lower index like np.argmin."""
+    order = np.argsort(axis, kind='stable')
+    sorted_axis = axis[order]
+    right = np.clip(np.searchsorted(sorted_axis, values), 1, len(axis) - 1)
+    left = right - 1
+    left_distance = np.abs(values - sorted_axis[left])
+    right_distance = np.abs(sorted_axis[right] - values)
+    tie = np.minimum(order[left], order[right])
+    return np.where(left_distance < right_distance, order[left],
+                    np.where(right_distance < left_distance, order[right], tie))
+
+
+class Dataset:
+    """Spectra and chemical shift axis, opened on first access.
+
+    With a `preprocessing` stage (a SpectrumPreprocessing), metabolite
+    intensities come from the corrected spectra instead of the raw points;
+    the peaks of every subject are computed once per parameter set.
+    Graphs are built on several threads at once, so each lazy value is
+    filled under a lock, by the first thread that needs it.
+    """
+
+    def __init__(self, spectra_path=SPECTRA_PATH, chemical_shifts_path=CHEMICAL_SHIFTS_PATH,
+                 feature_index_path=None, preprocessing=None):
+        self.spectra_path = spectra_path
+        self.chemical_shifts_path = chemical_shifts_path
+        self.feature_index_path = feature_index_path
+        self.preprocessing = preprocessing
+        # (metabolites, subjects) peaks of the first subjects, per preprocessing parameter set
+        self._preprocessed_peaks = {}
+        self._spectrum_store = None
+        self._chemical_shifts_array = None
+        self._metabolite_indices = None
+        self._feature_index = False
+        # Reentrant: filling one lazy value reads others
+        self._lock = threading.RLock()
+
+    @property
+    def spectrum_store(self):
+        if self._spectrum_store is None:
+            with self._lock:
+                if self._spectrum_store is None:
+                    self._spectrum_store = SpectrumStore(self.spectra_path)
+        return self._spectrum_store
+
+    @property
+    def spectra(self):
+        return self.spectrum_store.array
+
+    @property
+    def chemical_shifts_array(self):
+        if self._chemical_shifts_array is None:
+            with self._lock:
+                if self._chemical_shifts_array is None:
+                    self._chemical_shifts_array = SpectrumStore(self.chemical_shifts_path).array
+        return self._chemical_shifts_array
+
+    @property
+    def metabolite_indices(self):
+        """Spectrum row of every metabolite, in chemical_shifts order, computed once."""
+        if self._metabolite_indices is None:
+            with self._lock:
+                if self._metabolite_indices is None:
+                    self._metabolite_indices = nearest_indices(np.asarray(self.chemical_shifts_array),
+                                                               metabolite_shift_values)
+        return self._metabolite_indices
+
+    def metabolite_intensities(self, subject_ids=slice(None)):
+        """Metabolite peak intensities as a (metabolites, subjects) array."""
+        if self.preprocessing is not None:
+            return self.preprocessed_peaks()[:, subject_ids]
+        return np.asarray(self.spectra[self.metabolite_indices, :][:, subject_ids])
+
+    def preprocessed_peaks(self):
+        """Peaks of every subject under the preprocessing stage, computed for all new subjects at once."""
+        peaks = self._preprocessed_peaks.get(self.preprocessing)
+        if peaks is not None and peaks.shape[1] >= self.subject_count:
+            return peaks
+        with self._lock:
+            peaks = self._preprocessed_peaks.get(self.preprocessing)
+            done = 0 if peaks is None else peaks.shape[1]
+            if done < self.subject_count:
+                new = self.spectrum_intensities(self.spectra[:, done:self.subject_count])
+                peaks = new if peaks is None else np.concatenate([peaks, new], axis=1)
+                self._preprocessed_peaks[self.preprocessing] = peaks
+            return peaks
+
+    def corrected_spectra(self, spectra):
+        """(points, n) spectra after the preprocessing stage's baseline correction and smoothing, if there is one."""
+        if self.preprocessing is None:
+            return np.asarray(spectra)
+        return self.preprocessing.correct(spectra, np.asarray(self.chemical_shifts_array))
+
+    def spectrum_intensities(self, spectra):
+        """(metabolites, n) peaks of (points, n) spectra that are not in the store, preprocessed like the dataset's."""
+        spectra = np.asarray(spectra, dtype=np.float64)
+        if self.preprocessing is None:
+            return spectra[self.metabolite_indices]
+        return self.preprocessing.peak_intensities(spectra, np.asarray(self.chemical_shifts_array), self.metabolite_indices)
+
+    @property
+    def feature_index(self):
+        """Precomputed features matching these spectra, or None to compute them live."""
+        if self.preprocessing is not None:
+            # The index holds the features of the raw peaks
+            return None
+        if self._feature_index is False:
+            with self._lock:
+                if self._feature_index is False:
+                    from FeatureIndex import FeatureIndex
+                    self._feature_index = FeatureIndex.open(self, self.feature_index_path)
+        return self._feature_index
+
+    @property
+    def subject_count(self):
+        return self.spectrum_store.shape[1]
+
+    def subject_labels(self):
+        """Display name of every subject: CSV columns alternate Time 1 / Time 2, appended ones use their file name."""
+        store = self.spectrum_store
+        return ([f"Subject {i//2} (Time {i%2+1})" for i in range(store.source_columns)] +
+                [entry["label"] for entry in store.ingested])
+
+    def subject_label(self, subject_id):
+        return self.subject_labels()[subject_id]
+
+
+dataset = Dataset()
+
+
+def get_dataset():
+    return dataset
+
+
+def use_dataset(spectra_path=SPECTRA_PATH, chemical_shifts_path=CHEMICAL_SHIFTS_PATH, feature_index_path=None,
+                preprocessing=None):
+    """Point every new Graph at another pair of dataset files."""
+    global dataset
+    dataset = Dataset(spectra_path, chemical_shifts_path, feature_index_path, preprocessing)
+    return dataset
+
+
+def __getattr__(name):
+    # Module-level aliases kept for callers that predate the lazy Dataset
+    if name in ("spectra", "chemical_shifts_array", "spectrum_store"):
+        return getattr(dataset, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 class Graph:
-    def __init__(self, subject_id, graph_type="Complete Metabolite Graph"):
+    def __init__(self, subject_id, graph_type="Complete Metabolite Graph", dataset=None,
+                 nvg_engine="divide-and-conquer", ppm_window=None, metabolites=None, metrics_engine="vectorised",
+                 spectrum=None):
+        if nvg_engine not in NVG_ENGINES:
+            raise ValueError(f"Unknown natural visibility graph engine: {nvg_engine}")
+        if metrics_engine not in METRICS_ENGINES:
+            raise ValueError(f"Unknown metrics engine: {metrics_engine}")
+        self.dataset = dataset if dataset is not None else get_dataset()
         self.subject_index = subject_id
         self.graph_type = graph_type
-        self.current_spectrum = spectra[:, subject_id]
-        self.nodes = []
-        self.edges = []
-        self.indices = []
+        self.nvg_engine = nvg_engine
+        self.metrics_engine = metrics_engine
+        self.ppm_window = ppm_window
+        # Symbols of the metabolites to build nodes for; None keeps all of them
+        self.metabolites = None if metabolites is None else frozenset(metabolites)
+        # A spectrum given here (such as one frame of a SpectrumSeries) replaces the subject's column
+        self.given_spectrum = spectrum is not None
+        self.current_spectrum = (np.asarray(spectrum, dtype=np.float64) if self.given_spectrum
+                                 else self.dataset.spectrum_store.column(subject_id))
+        self.indices = None
+        self.clear_metabolite_graph()
         self.initialize_graph()
         
+    @property
+    def is_full_spectrum(self):
+        return self.graph_type.lower() in FULL_SPECTRUM_GRAPH_TYPES
+
+    @timed("graph.build")
     def initialize_graph(self):
+        if self.is_full_spectrum:
+            self.create_spectrum_graph()
+            self.compute_spectrum_features()
+            return
+
         self.create_nodes()
         self.reduce_series()
         self.create_edges()
@@ -38,99 +255,233 @@ class Graph:
 
     def change_subject(self, subject_id):
         self.subject_index = subject_id
-        self.current_spectrum = spectra[:, subject_id]
+        self.given_spectrum = False
+        self.current_spectrum = self.dataset.spectrum_store.column(subject_id)
         self.initialize_graph()
 
+    @timed("graph.create_nodes")
     def create_nodes(self):
+        for name in SPECTRUM_ATTRIBUTES:
+            setattr(self, name, None)
         self.nodes = []
         pcr_intensity = 1.0  # Default value
 
-        for details in metabolite_shifts.values():
-            shift_value = details['value']
-            symbol = details['symbol']
-            index = np.argmin(np.abs(chemical_shifts_array - shift_value))
-            intensity = self.current_spectrum[index]
-            
+        self.indices = self.dataset.metabolite_indices
+        if self.dataset.preprocessing is None:
+            intensities = self.current_spectrum[self.indices]
+        elif self.given_spectrum:
+            intensities = self.dataset.spectrum_intensities(self.current_spectrum[:, None])[:, 0]
+        else:
+            intensities = self.dataset.metabolite_intensities(self.subject_index)
+        for symbol, shift_value, intensity in zip(metabolite_symbols, metabolite_shift_values, intensities):
+            if self.metabolites is not None and symbol not in self.metabolites:
+                continue
             if symbol == 'PCr':
                 pcr_intensity = intensity
-                
-            self.indices.append(index)
-            self.nodes.append({"name": symbol, "coordinates": (shift_value, intensity)})
+
+            self.nodes.append({"name": symbol, "coordinates": (float(shift_value), intensity)})
 
         # Sort and calculate PCr ratio
         self.nodes = sorted(self.nodes, key=lambda x: x['coordinates'][1], reverse=True)
         for node in self.nodes:
             node['pcr_ratio'] = node['coordinates'][1] / pcr_intensity
-            
+
+        # Node arrays in self.nodes order; edges refer to nodes by position in them
+        self.node_names = [node["name"] for node in self.nodes]
+        self.node_index = {name: i for i, name in enumerate(self.node_names)}
+        self.node_shifts = np.array([node["coordinates"][0] for node in self.nodes], dtype=np.float64)
+        self.node_intensities = np.array([node["coordinates"][1] for node in self.nodes], dtype=np.float64)
+
         # Initialize adjacency matrix
         n = len(self.nodes)
         self.undirected_connection_matrix = np.zeros((n, n), dtype=np.float64)
 
     def reduce_series(self):
-        self.non_sorted_nodes = sorted(self.nodes.copy(), key=lambda x: x['coordinates'][0], reverse=True)
-        self.reduced_series = [node["coordinates"][1] for node in self.non_sorted_nodes]
+        # Nodes in descending chemical shift order, the order visibility is evaluated in
+        self.reduced_order = np.argsort(-self.node_shifts, kind='stable')
+        self.non_sorted_nodes = [self.nodes[i] for i in self.reduced_order]
+        self.reduced_series = self.node_intensities[self.reduced_order].tolist()
 
+    @timed("graph.create_edges")
     def create_edges(self):
-        self.edges = []
-        
+        # Rows of the connection matrix (and of every local feature) follow this node list
+        self.matrix_nodes = self.nodes
+
         if self.graph_type.lower() == "complete metabolite graph":
-            for i in range(len(self.nodes)):
-                for j in range(i + 1, len(self.nodes)):
-                    self.add_edge(self.nodes[i], self.nodes[j], i, j)
+            first, second = np.triu_indices(len(self.nodes), 1)
         else:
-            # Create visibility graph
+            # Create visibility graph over the reduced series, then map back to node positions
             if self.graph_type.lower() == "natural visibility graph":
-                graph = visibility_graph(self.reduced_series)
+                if self.nvg_engine == "visibility_graph":
+                    from visibility_graph import visibility_graph
+                    edge_list = np.array(visibility_graph(self.reduced_series).edges(), dtype=np.intp)
+                else:
+                    edge_list = natural_visibility_edges(self.reduced_series)
             elif self.graph_type.lower() == "horizontal visibility graph":
-                graph = horizontal_visibility_graph(self.reduced_series)
-                
-            # Convert graph to edges
-            for i, j in graph.edges():
-                self.add_edge(self.non_sorted_nodes[i], self.non_sorted_nodes[j], i, j)
-
-    def add_edge(self, metabolite_1, metabolite_2, i, j):
-        edge, weight = self.construct_edge(metabolite_1, metabolite_2)
-        self.undirected_connection_matrix[i, j] = weight
-        self.undirected_connection_matrix[j, i] = 1 / weight
-        self.edges.append(edge)
-
-    def construct_edge(self, metabolite_1, metabolite_2):
-        if metabolite_1["coordinates"][1] >= metabolite_2["coordinates"][1]:
-            top, bottom = metabolite_1, metabolite_2
-        else:
-            top, bottom = metabolite_2, metabolite_1
+                edge_list = horizontal_visibility_edges(self.reduced_series)
+            edge_list = np.asarray(edge_list, dtype=np.intp).reshape(-1, 2)
+            first, second = self.reduced_order[edge_list[:, 0]], self.reduced_order[edge_list[:, 1]]
+
+        # Edges point from the more intense metabolite to the less intense one
+        ratios = self.node_intensities[:, None] / self.node_intensities[None, :]
+        first_on_top = self.node_intensities[first] >= self.node_intensities[second]
+        source = np.where(first_on_top, first, second)
+        target = np.where(first_on_top, second, first)
+        weights = ratios[source, target]
+
+        self.undirected_connection_matrix[first, second] = weights
+        self.undirected_connection_matrix[second, first] = 1 / weights
 
-        weight = top["coordinates"][1] / bottom["coordinates"][1]
+        self.edge_array = np.zeros(len(weights), dtype=EDGE_DTYPE)
+        self.edge_array["source"] = source
+        self.edge_array["target"] = target
+        self.edge_array["weight"] = weights
+        self._edge_dicts = None
 
-        edge = {
-            "source": top["name"],
-            "target": bottom["name"],
-            "weight": weight
-        }
-        return edge, weight
+    @property
+    def edges(self):
+        """Dict view of edge_array with metabolite names, as used by the UI; empty for full-spectrum graphs."""
+        if self.is_full_spectrum:
+            # Their edges are spectrum point pairs, in spectrum_edges
+            return []
+        if self._edge_dicts is None:
+            names = self.node_names
+            fields = EDGE_DTYPE.names[2:]
+            self._edge_dicts = [
+                {"source": names[source], "target": names[target], **dict(zip(fields, values))}
+                for source, target, *values in self.edge_array.tolist()
+            ]
+        return self._edge_dicts
 
     def normalize_weights(self):
-        if not self.edges:
+        if not len(self.edge_array):
             return
-            
-        weights = [abs(edge["weight"]) for edge in self.edges]
-        self.min_w, self.max_w = min(weights), max(weights)
-        weight_range = self.max_w - self.min_w
-        
-        for edge in self.edges:
-            normalized, linewidth, alpha = self.get_linewidth_alpha(edge["weight"])
-            edge["weight_normalized"] = normalized
-            edge["linewidth"] = linewidth
-            edge["alpha"] = alpha
+
+        weights = np.abs(self.edge_array["weight"])
+        self.min_w, self.max_w = weights.min(), weights.max()
+        normalized, linewidth, alpha = self.get_linewidth_alpha(self.edge_array["weight"])
+        self.edge_array["weight_normalized"] = normalized
+        self.edge_array["linewidth"] = linewidth
+        self.edge_array["alpha"] = alpha
+        self._edge_dicts = None
 
     def get_linewidth_alpha(self, weight):
-        """Get the line width and alpha values based on the edge weight."""
-        normalized = (abs(weight) - self.min_w) / (self.max_w - self.min_w) if (self.max_w - self.min_w) else 1.0
+        """Get the line width and alpha values based on the edge weight (a scalar or an array)."""
+        weight_range = self.max_w - self.min_w
+        if weight_range:
+            normalized = (np.abs(weight) - self.min_w) / weight_range
+        else:
+            normalized = np.ones(np.shape(weight)) if np.ndim(weight) else 1.0
         linewidth = MIN_THICKNESS + normalized * (MAX_THICKNESS - MIN_THICKNESS)
         alpha = MIN_ALPHA + normalized * (MAX_ALPHA - MIN_ALPHA)
-        return normalized,linewidth, alpha
+        return normalized, linewidth, alpha
+
+    def clear_metabolite_graph(self):
+        """No nodes, edges or metabolite features, so nothing of a previous metabolite graph is left over."""
+        self.nodes = []
+        self.matrix_nodes = []
+        self.non_sorted_nodes = []
+        self.node_names = []
+        self.node_index = {}
+        self.node_shifts = np.zeros(0)
+        self.node_intensities = np.zeros(0)
+        self.reduced_order = np.zeros(0, dtype=np.intp)
+        self.reduced_series = []
+        self.undirected_connection_matrix = np.zeros((0, 0))
+        self.edge_array = np.zeros(0, dtype=EDGE_DTYPE)
+        self._edge_dicts = None
+        for name in METABOLITE_FEATURES:
+            setattr(self, name, None)
+
+    @timed("graph.create_spectrum_graph")
+    def create_spectrum_graph(self):
+        """Visibility graph over every spectrum point inside ppm_window, as a sparse matrix.
+
+        Edges are weighted by their view angle, arctan(|dy| / dx), with
+        intensities scaled to the window's peak amplitude and dx in points.
+        The dataset's preprocessing stage, if any, corrects the spectrum first.
+        """
+        self.clear_metabolite_graph()
+        shifts = np.asarray(self.dataset.chemical_shifts_array)
+        if self.ppm_window is None:
+            self.spectrum_indices = np.arange(len(shifts))
+        else:
+            low, high = sorted(self.ppm_window)
+            self.spectrum_indices = np.flatnonzero((shifts >= low) & (shifts <= high))
+        self.spectrum_shifts = shifts[self.spectrum_indices]
+        spectrum = self.current_spectrum
+        if self.dataset.preprocessing is not None:
+            spectrum = self.dataset.corrected_spectra(np.asarray(spectrum)[:, None])[:, 0]
+        self.spectrum_intensities = np.asarray(spectrum[self.spectrum_indices])
+
+        if self.graph_type.lower() == "full-spectrum horizontal visibility graph":
+            edges = horizontal_visibility_edges(self.spectrum_intensities)
+        elif self.nvg_engine == "visibility_graph":
+            from visibility_graph import visibility_graph
+            edges = np.array(visibility_graph(self.spectrum_intensities.tolist()).edges(), dtype=np.intp).reshape(-1, 2)
+        else:
+            edges = natural_visibility_edges(self.spectrum_intensities)
+
+        scale = np.max(np.abs(self.spectrum_intensities), initial=0.0) or 1.0
+        rise = np.abs(self.spectrum_intensities[edges[:, 1]] - self.spectrum_intensities[edges[:, 0]]) / scale
+        weights = np.arctan(rise / np.abs(edges[:, 1] - edges[:, 0]))
+
+        self.spectrum_edges = edges
+        self.spectrum_adjacency = edges_to_adjacency(edges, len(self.spectrum_indices), weights)
+
+    @timed("graph.spectrum_features")
+    def compute_spectrum_features(self):
+        """Degree, strength and clustering from the sparse adjacency, without densifying it."""
+        adjacency = self.spectrum_adjacency
+        binary = adjacency.copy()
+        binary.data[:] = 1.0
+        n = adjacency.shape[0]
+
+        # Local features
+        self.spectrum_degrees = np.asarray(binary.sum(axis=1)).ravel()
+        self.spectrum_strengths = np.asarray(adjacency.sum(axis=1)).ravel()
+        triangles = np.asarray((binary @ binary).multiply(binary).sum(axis=1)).ravel() / 2
+        pairs = self.spectrum_degrees * (self.spectrum_degrees - 1) / 2
+        self.spectrum_clustering_coefs = np.divide(triangles, pairs, out=np.zeros(n), where=pairs > 0)
+
+        # Global features
+        self.density = binary.nnz / (n * (n - 1)) if n > 1 else 0.0
+        self.average_degree = np.average(self.spectrum_degrees) if n else 0.0
+        self.average_strength = np.average(self.spectrum_strengths) if n else 0.0
+        self.average_clustering_coef = np.average(self.spectrum_clustering_coefs) if n else 0.0
 
+    def load_indexed_features(self):
+        """Take the features from the dataset's feature index; False if it has no entry for this graph."""
+        if self.metabolites is not None or self.given_spectrum:
+            return False
+        index = self.dataset.feature_index
+        features = index.lookup(self.subject_index, self.graph_type) if index is not None else None
+        if features is None:
+            return False
+
+        positions = [index.symbols.index(node["name"]) for node in self.matrix_nodes]
+        for name, value in features.items():
+            setattr(self, name, value[positions] if np.ndim(value) else value)
+        return True
+
+    @timed("graph.features")
     def compute_graph_features(self):
+        if self.load_indexed_features():
+            return
+
+        if self.metrics_engine == "vectorised":
+            for name, value in graph_metrics(self.undirected_connection_matrix).items():
+                setattr(self, name, value)
+        else:
+            self.compute_bct_features()
+
+        # Derived metrics
+        self.average_local_efficiency = np.average(self.local_efficiency)
+        self.average_betweenness_centrality = np.average(self.undirected_betweenness_centralities)
+
+    def compute_bct_features(self):
+        import bct
+
         # Local features
         self.undirected_strengths = bct.strengths_und(self.undirected_connection_matrix)
         self.undirected_betweenness_centralities = bct.betweenness_wei(self.undirected_connection_matrix)
@@ -142,7 +493,215 @@ class Graph:
         self.global_efficiency = bct.efficiency_wei(self.undirected_connection_matrix)
         self.char_path_length = bct.charpath(self.undirected_connection_matrix)[0]
         self.undirected_transitivity_wu = bct.transitivity_wu(self.undirected_connection_matrix)
-        
-        # Derived metrics
-        self.average_local_efficiency = np.average(self.local_efficiency)
-        self.average_betweenness_centrality = np.average(self.undirected_betweenness_centralities)
+
+
+class Cohort:
+    """Metabolite graphs of many subjects as stacked (subjects, n, n) arrays.
+
+    Every subject has the same nodes, in metabolite_symbols order, so their
+    connection matrices stack and all features are computed in one batch.
+    Graph orders its nodes by intensity instead but builds the same matrix up
+    to that permutation. Passing `intensities` builds the graphs from given
+    (subjects, metabolites) peaks, such as resampled ones, instead of the
+    dataset's.
+    """
+
+    FEATURE_CHUNK = 256
+
+    def __init__(self, subject_ids=None, graph_type="Complete Metabolite Graph", dataset=None, intensities=None):
+        self.dataset = dataset if dataset is not None else get_dataset()
+        if subject_ids is None:
+            subject_ids = range(self.dataset.subject_count if intensities is None else len(intensities))
+        self.subject_ids = np.asarray(subject_ids, dtype=np.intp).reshape(-1)
+        self.graph_type = graph_type
+        self.symbols = list(metabolite_symbols)
+        # (subjects, metabolites)
+        if intensities is None:
+            self.intensities = self.dataset.metabolite_intensities(self.subject_ids).T
+        else:
+            self.intensities = np.asarray(intensities, dtype=np.float64).reshape(-1, len(self.symbols))
+        self.pairs = self.create_pairs()
+        self.connection_matrices = self.create_connection_matrices()
+        self._features = None
+        self._distances = None
+
+    def __len__(self):
+        return len(self.subject_ids)
+
+    def create_pairs(self):
+        """(subjects, n, n) mask, True at (first, second) for every edge, in Graph's pair order."""
+        subjects, n = self.intensities.shape
+        kind = self.graph_type.lower()
+        if kind == "complete metabolite graph":
+            # Graph pairs every node with those after it in descending intensity order
+            rank = np.argsort(np.argsort(-self.intensities, axis=1, kind='stable'), axis=1, kind='stable')
+            return rank[:, :, None] < rank[:, None, :]
+
+        # Visibility runs over the peaks in descending chemical shift order
+        order = np.argsort(-metabolite_shift_values, kind='stable')
+        series = self.intensities[:, order]
+        if kind == "natural visibility graph":
+            masks = natural_visibility_masks(series)
+        elif kind == "horizontal visibility graph":
+            # Horizontal visibility only compares heights, so rows with the same ranking (consecutive
+            # frames of a series, mostly) share one topology, evaluated once on the ranks themselves
+            patterns, inverse = np.unique(dense_ranks(series), axis=0, return_inverse=True)
+            masks = horizontal_visibility_masks(patterns)[inverse.reshape(-1)]
+        else:
+            raise ValueError(f"Cohorts are built for metabolite graph types only, not {self.graph_type!r}")
+
+        pairs = np.zeros((subjects, n, n), dtype=bool)
+        pairs[:, order[:, None], order[None, :]] = masks
+        return pairs
+
+    def create_connection_matrices(self):
+        """Graph.create_edges for every subject: w from the more to the less intense node at (first, second), 1 / w back."""
+        above = self.intensities[:, :, None]
+        below = self.intensities[:, None, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weights = np.where(above >= below, above / below, below / above)
+            forward = np.where(self.pairs, weights, 0.0)
+            backward = np.where(self.pairs, 1 / np.where(self.pairs, weights, 1.0), 0.0)
+        return forward + np.swapaxes(backward, 1, 2)
+
+    @property
+    def adjacency(self):
+        """(subjects, n, n) symmetric boolean adjacency."""
+        return self.pairs | np.swapaxes(self.pairs, 1, 2)
+
+    @property
+    def distances(self):
+        """Weighted distance matrices over the 1 / w connection lengths, as used for efficiency."""
+        if self._distances is None:
+            self._distances = label_setting_distances(invert(self.connection_matrices))
+        return self._distances
+
+    @property
+    def features(self):
+        """Graph's feature attributes for every subject: (subjects, n) local, (subjects,) global arrays."""
+        if self._features is None:
+            # A chunk of subjects at a time keeps the batched searches' arrays small for large cohorts
+            chunks = [graph_metrics(self.connection_matrices[start:start + self.FEATURE_CHUNK])
+                      for start in range(0, max(len(self.connection_matrices), 1), self.FEATURE_CHUNK)]
+            features = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+            features["average_local_efficiency"] = features["local_efficiency"].mean(axis=1)
+            features["average_betweenness_centrality"] = features["undirected_betweenness_centralities"].mean(axis=1)
+            self._features = features
+        return self._features
+
+
+def build_cohort(subject_ids=None, graph_type="Complete Metabolite Graph", dataset=None):
+    """Build the metabolite graphs of many subjects (all by default) at once; see Cohort."""
+    return Cohort(subject_ids, graph_type, dataset)
+
+
+class SpectrumSeries:
+    """Metabolite graph features over time, from one subject's dynamic acquisition.
+
+    `frames` is a (points, frames) array of spectra on the dataset's chemical
+    shift axis, such as the acquisitions of a PCr recovery. Each sliding
+    window of `window` frames, started every `step` frames, gives one graph
+    over its mean spectrum. Only the metabolite peak rows are read, once per
+    frame; the window means are taken on those peaks (the same as the peaks
+    of the mean spectrum) and built as one Cohort. With a preprocessing
+    stage on the dataset, which is not linear, the mean spectrum of every
+    window is preprocessed instead. `append` adds frames as they are
+    acquired and builds only the windows they complete.
+    """
+
+    def __init__(self, frames=None, graph_type="Complete Metabolite Graph", window=1, step=1, dataset=None):
+        if window < 1 or step < 1:
+            raise ValueError("window and step must be at least 1 frame")
+        self.dataset = dataset if dataset is not None else get_dataset()
+        self.graph_type = graph_type
+        self.window = window
+        self.step = step
+        self.symbols = list(metabolite_symbols)
+        self.points = len(self.dataset.chemical_shifts_array)
+        # Appended frames as they came, frames first: (frames, points) spectra and (frames, metabolites) peaks,
+        # with the index of each block's first frame; windows read only the blocks they overlap
+        self.frame_blocks = []
+        self.peak_blocks = []
+        self.block_starts = []
+        self.frame_count = 0
+        # First frame of every window built so far, and its (windows, metabolites) mean peaks
+        self.starts = np.zeros(0, dtype=np.intp)
+        self.intensities = np.zeros((0, len(self.symbols)))
+        self.features = {}
+        if frames is not None:
+            self.append(frames)
+
+    def __len__(self):
+        return len(self.starts)
+
+    @timed("series.append")
+    def append(self, frames):
+        """Add (points,) or (points, frames) spectra; returns the number of windows completed."""
+        frames = np.asarray(frames, dtype=np.float64)
+        frames = frames.reshape(len(frames), -1)
+        if len(frames) != self.points:
+            raise ValueError(f"Frames have {len(frames)} points; the chemical shift axis has {self.points}")
+        self.block_starts.append(self.frame_count)
+        self.frame_blocks.append(frames.T)
+        self.peak_blocks.append(frames[self.dataset.metabolite_indices].T)
+        self.frame_count += frames.shape[1]
+
+        first = self.starts[-1] + self.step if len(self.starts) else 0
+        starts = np.arange(first, self.frame_count - self.window + 1, self.step, dtype=np.intp)
+        if not len(starts):
+            return 0
+
+        stop = starts[-1] + self.window
+        if self.dataset.preprocessing is None:
+            intensities = self.window_means(self.frame_rows(self.peak_blocks, starts[0], stop), starts)
+        else:
+            spectra = self.window_means(self.frame_rows(self.frame_blocks, starts[0], stop), starts)
+            intensities = self.dataset.spectrum_intensities(spectra.T).T
+
+        features = Cohort(graph_type=self.graph_type, dataset=self.dataset, intensities=intensities).features
+        self.starts = np.concatenate([self.starts, starts])
+        self.intensities = np.concatenate([self.intensities, intensities])
+        self.features = {name: np.concatenate([self.features[name], value]) if name in self.features else value
+                         for name, value in features.items()}
+        return len(starts)
+
+    def frame_rows(self, blocks, first, stop):
+        """Frames first to stop - 1 of frames-first blocks, copying only the blocks they overlap."""
+        position = bisect.bisect_right(self.block_starts, first) - 1
+        parts = []
+        for start, block in zip(self.block_starts[position:], blocks[position:]):
+            if start >= stop:
+                break
+            parts.append(block[max(first - start, 0):stop - start])
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def window_means(self, covered, starts):
+        """Mean over each window of (frames, ...) values that start at frame starts[0], from one cumulative sum."""
+        sums = np.concatenate([np.zeros((1,) + covered.shape[1:]), np.cumsum(covered, axis=0)])
+        offsets = starts - starts[0]
+        return (sums[offsets + self.window] - sums[offsets]) / self.window
+
+    @property
+    def peaks(self):
+        """(frames, metabolites) raw peaks of every frame appended so far."""
+        return np.concatenate(self.peak_blocks) if self.peak_blocks else np.zeros((0, len(self.symbols)))
+
+    @property
+    def frames(self):
+        """All (points, frames) spectra appended so far."""
+        return np.concatenate(self.frame_blocks).T if self.frame_blocks else np.zeros((self.points, 0))
+
+    def frame_spectrum(self, position):
+        """Mean spectrum of the position-th window."""
+        start = self.starts[position]
+        return self.frame_rows(self.frame_blocks, start, start + self.window).mean(axis=0)
+
+    def graph(self, position, subject_id=0, **options):
+        """Full Graph of the position-th window, for drawing; features match the trajectories'."""
+        return Graph(subject_id, self.graph_type, dataset=self.dataset, spectrum=self.frame_spectrum(position),
+                     **options)
+
+
+def build_series(frames, graph_type="Complete Metabolite Graph", window=1, step=1, dataset=None):
+    """Feature trajectories of a dynamic acquisition's (points, frames) spectra; see SpectrumSeries."""
+    return SpectrumSeries(frames, graph_type, window, step, dataset)
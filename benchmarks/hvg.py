@@ -0,0 +1,54 @@
+"""Compare the stack-based horizontal visibility graph with the original nested loop.
+
+Usage: python benchmarks/hvg.py [--sizes 14 2048 65536] [--repeat N] [--signal walk|noise]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from HVG import horizontal_visibility_edges  # noqa: E402
+
+
+def legacy_horizontal_visibility_edges(series):
+    """The pre-stack implementation, without the networkx graph construction."""
+    n = len(series)
+    edges = []
+    for i in range(n):
+        for j in range(i + 1, n):
+            if all(series[k] < min(series[i], series[j]) for k in range(i + 1, j)):
+                edges.append((i, j))
+            else:
+                break
+    return edges
+
+
+def best_of(function, series, repeat):
+    number = max(1, int(2e4 // len(series)))
+    return min(timeit.repeat(lambda: function(series), number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[14, 2048, 65536])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--signal", choices=["noise", "walk"], default="walk",
+                        help="white noise, or a random walk whose long monotone runs resemble smooth spectra")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'n':>8}{'legacy':>14}{'stack':>14}{'speedup':>10}")
+    for n in args.sizes:
+        series = rng.normal(size=n)
+        series = (np.cumsum(series) if args.signal == "walk" else series).tolist()
+        legacy = best_of(legacy_horizontal_visibility_edges, series, args.repeat)
+        stack = best_of(horizontal_visibility_edges, series, args.repeat)
+        print(f"{n:>8}{legacy * 1e3:>12.3f}ms{stack * 1e3:>12.3f}ms{legacy / stack:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
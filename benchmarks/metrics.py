@@ -0,0 +1,104 @@
+"""Check the vectorised graph metrics against bct on every subject and time both.
+
+Also checks build_cohort's batched features against the per-subject Graphs.
+Exits with status 1 if any metric differs beyond the tolerance.
+
+Usage: python benchmarks/metrics.py [--graph-types ...] [--repeat N] [--rtol 1e-9]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import GraphMetrics  # noqa: E402
+import WeightedVisibilityGraph  # noqa: E402
+
+
+def bct_metrics(W):
+    """The original compute_graph_features calls."""
+    import bct
+    # charpath divides by the zero entries of the matrix it is given
+    with np.errstate(divide="ignore"):
+        return {
+            "undirected_strengths": bct.strengths_und(W),
+            "undirected_betweenness_centralities": bct.betweenness_wei(W),
+            "undirected_clustering_coefs": bct.clustering_coef_wd(W),
+            "local_efficiency": bct.efficiency_wei(W, local=True),
+            "density": bct.density_und(W)[0],
+            "global_efficiency": bct.efficiency_wei(W),
+            "char_path_length": bct.charpath(W)[0],
+            "undirected_transitivity_wu": bct.transitivity_wu(W),
+        }
+
+
+def subject_graphs(graph_types):
+    """Every subject's Graph per graph type."""
+    subjects = range(WeightedVisibilityGraph.get_dataset().subject_count)
+    return {
+        graph_type: [WeightedVisibilityGraph.Graph(subject, graph_type) for subject in subjects]
+        for graph_type in graph_types
+    }
+
+
+def cohort_mismatches(cohort, graphs, rtol):
+    """Features of the batched cohort that differ from the per-subject Graph ones."""
+    mismatches = []
+    for row, graph in enumerate(graphs):
+        positions = [cohort.symbols.index(node["name"]) for node in graph.matrix_nodes]
+        for name, values in cohort.features.items():
+            value = values[row][positions] if np.ndim(values[row]) else values[row]
+            if not np.allclose(value, getattr(graph, name), rtol=rtol, atol=1e-12, equal_nan=True):
+                mismatches.append(f"subject {graph.subject_index} {name}")
+    return mismatches
+
+
+def best_of(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--graph-types", nargs="+", default=[
+        "Complete Metabolite Graph", "Natural Visibility Graph", "Horizontal Visibility Graph"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    args = parser.parse_args()
+
+    mismatches = 0
+    print(f"{'graph type':<30}{'bct':>12}{'vectorised':>14}{'stacked':>12}{'cohort':>12}{'speedup':>10}")
+    for graph_type, graphs in subject_graphs(args.graph_types).items():
+        matrices = [graph.undirected_connection_matrix for graph in graphs]
+        for subject, W in enumerate(matrices):
+            expected = bct_metrics(W)
+            actual = GraphMetrics.graph_metrics(W)
+            for name in GraphMetrics.METRIC_NAMES:
+                if not np.allclose(actual[name], expected[name], rtol=args.rtol, atol=1e-12, equal_nan=True):
+                    mismatches += 1
+                    print(f"MISMATCH {graph_type} subject {subject} {name}: {actual[name]} != {expected[name]}")
+
+        count = len(matrices)
+        reference = best_of(lambda: [bct_metrics(W) for W in matrices], args.repeat) / count
+        vectorised = best_of(lambda: [GraphMetrics.graph_metrics(W) for W in matrices], args.repeat) / count
+        stacked = best_of(lambda: GraphMetrics.graph_metrics(np.stack(matrices)), args.repeat) / count
+        cohort = best_of(lambda: WeightedVisibilityGraph.build_cohort(graph_type=graph_type).features, args.repeat) / count
+        print(f"{graph_type:<30}{reference * 1e3:>10.2f}ms{vectorised * 1e3:>12.2f}ms"
+              f"{stacked * 1e3:>10.2f}ms{cohort * 1e3:>10.2f}ms{reference / vectorised:>9.1f}x")
+
+        for mismatch in cohort_mismatches(WeightedVisibilityGraph.build_cohort(graph_type=graph_type), graphs, args.rtol):
+            mismatches += 1
+            print(f"MISMATCH cohort {graph_type} {mismatch}")
+
+    print("parity: OK" if not mismatches else f"parity: {mismatches} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
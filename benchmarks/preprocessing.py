@@ -0,0 +1,85 @@
+"""Check the preprocessing peak fits on synthetic spectra with known peaks and time them.
+
+First two overlapping Lorentzians only, NAD+ and NADH 0.18 ppm apart, then
+a cohort with a Lorentzian at every metabolite over a curved baseline and
+noise. Exits with status 1 if a fitted height misses the true one by more
+than the tolerance.
+
+Usage: python benchmarks/preprocessing.py [--subjects 500] [--tolerance 0.05]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import WeightedVisibilityGraph  # noqa: E402
+from SpectrumPreprocessing import SpectrumPreprocessing  # noqa: E402
+
+
+def lorentzians(shifts, heights, centres, widths):
+    """(points, subjects) sum of the (peaks, subjects) Lorentzians."""
+    return (heights[:, None] / (1 + ((shifts[None, :, None] - centres[:, None]) / widths[:, None]) ** 2)).sum(axis=0)
+
+
+def relative_errors(preprocessing, spectra, shifts, indices, heights):
+    start = time.perf_counter()
+    fitted = preprocessing.peak_intensities(spectra, shifts, indices)
+    return np.abs(fitted - heights) / heights, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subjects", type=int, default=500)
+    parser.add_argument("--tolerance", type=float, default=0.05, help="allowed median relative height error")
+    args = parser.parse_args()
+
+    dataset = WeightedVisibilityGraph.get_dataset()
+    shifts = np.asarray(dataset.chemical_shifts_array)
+    symbols = WeightedVisibilityGraph.metabolite_symbols
+    rng = np.random.default_rng(0)
+    failures = 0
+
+    # Two overlapping peaks, exact, with the neighbouring ATPα absent
+    pair = [symbols.index("NAD+"), symbols.index("NADH")]
+    heights = np.array([[1.0e6, 2.5e6, 4.0e6], [3.0e6, 1.5e6, 0.5e6]])
+    centres = WeightedVisibilityGraph.metabolite_shift_values[pair][:, None] + np.array([0.02, -0.03, 0.0])
+    widths = np.full(heights.shape, 0.07)
+    spectra = lorentzians(shifts, heights, centres, widths)
+    errors, _ = relative_errors(SpectrumPreprocessing(peaks="lorentzian"), spectra, shifts,
+                                dataset.metabolite_indices[pair], heights)
+    nearest, _ = relative_errors(SpectrumPreprocessing(), spectra, shifts, dataset.metabolite_indices[pair], heights)
+    print(f"overlapping NAD+/NADH: max error {errors.max():.2e} fitted, {nearest.max():.2e} nearest point")
+    if errors.max() > 1e-3:
+        failures += 1
+        print(f"FAIL overlapping pair: fitted heights {errors.max():.1%} off")
+
+    # A cohort: every metabolite, a curved baseline and noise
+    count = args.subjects
+    heights = rng.lognormal(np.log(1e6), 0.5, size=(len(symbols), count))
+    centres = WeightedVisibilityGraph.metabolite_shift_values[:, None] + rng.uniform(-0.05, 0.05, size=heights.shape)
+    widths = rng.uniform(0.08, 0.12, size=heights.shape)
+    scaled = shifts / np.abs(shifts).max()
+    baseline = (3e5 + 2e5 * scaled + 1e5 * scaled ** 2)[:, None] * rng.uniform(0.5, 1.5, size=count)
+    spectra = lorentzians(shifts, heights, centres, widths) + baseline + rng.normal(0.0, 2e4, size=(len(shifts), count))
+
+    print(f"{'peaks':<12}{'median error':>14}{'worst metabolite':>24}{'per subject':>14}")
+    for peaks in ("nearest", "lorentzian"):
+        preprocessing = SpectrumPreprocessing(baseline_order=3, peaks=peaks)
+        errors, seconds = relative_errors(preprocessing, spectra, shifts, dataset.metabolite_indices, heights)
+        medians = np.median(errors, axis=1)
+        worst = int(np.argmax(medians))
+        print(f"{peaks:<12}{np.median(errors):>14.2%}{symbols[worst]:>16} {medians[worst]:>6.1%}"
+              f"{seconds / count * 1e3:>12.2f}ms")
+        if peaks == "lorentzian" and medians[worst] > args.tolerance:
+            failures += 1
+            print(f"FAIL cohort: {symbols[worst]} heights {medians[worst]:.1%} off")
+
+    print("accuracy: OK" if not failures else f"accuracy: {failures} failures")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Measure the cost of importing MRSight modules in a fresh interpreter.
+
+Usage: python benchmarks/startup.py [--repeat N] [module ...]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ["WeightedVisibilityGraph", "MRSight"]
+
+
+def time_import(module, repeat):
+    """Return wall-clock seconds for `import module` in `repeat` fresh processes."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=REPO_ROOT, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = time_import("numpy", args.repeat)
+    print(f"{'module':<28}{'median':>10}{'min':>10}{'over numpy':>12}")
+    print(f"{'numpy':<28}{statistics.median(baseline) * 1e3:>8.1f}ms{min(baseline) * 1e3:>8.1f}ms{'':>12}")
+    for module in args.modules:
+        timings = time_import(module, args.repeat)
+        overhead = statistics.median(timings) - statistics.median(baseline)
+        print(f"{module:<28}{statistics.median(timings) * 1e3:>8.1f}ms{min(timings) * 1e3:>8.1f}ms"
+              f"{overhead * 1e3:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""Benchmark the graph construction, metrics and redraw hot paths against a stored baseline.
+
+Everything runs headless (Qt's offscreen platform) on synthetic cohorts of
+18, 1k and 10k subjects written to a temporary spectrum store, so results
+do not depend on the real dataset. Each benchmark reports the best
+per-call time over --repeat rounds. Results are compared with the baseline
+file, and the script exits with status 1 when one is slower than the
+baseline by more than --tolerance. Use --save to record a new baseline.
+Timings only compare on the machine that recorded them: with a baseline
+from another machine the results are printed but not compared, and --save
+replaces it. Only the groups --only selects are set up, and each synthetic
+cohort is written the first time a benchmark uses it.
+
+Usage:
+    python benchmarks/suite.py                        # compare with benchmarks/baseline.json
+    python benchmarks/suite.py --save                 # store the results as the baseline
+    python benchmarks/suite.py --only graph. hvg.     # benchmarks whose names start with these
+    python benchmarks/suite.py --cohorts 18 1000      # skip the 10k cohort
+
+The dynamic.* benchmarks build sliding-window feature trajectories over a
+synthetic 500-frame acquisition.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+import WeightedVisibilityGraph  # noqa: E402
+from HVG import horizontal_visibility_edges  # noqa: E402
+from NVG import natural_visibility_edges  # noqa: E402
+from SpectrumPreprocessing import SpectrumPreprocessing  # noqa: E402
+from SpectrumStore import SpectrumStore  # noqa: E402
+
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+CHEMICAL_SHIFTS_PATH = os.path.join(REPO_ROOT, "Datasets", "chemical_shifts.csv")
+GRAPH_TYPES = ["Complete Metabolite Graph", "Natural Visibility Graph", "Horizontal Visibility Graph"]
+COHORT_SIZES = [18, 1000, 10000]
+SERIES_LENGTHS = {"hvg": [14, 2048, 65536], "nvg": [14, 2048, 16384]}
+DYNAMIC_FRAMES = 500
+# Differences below this are timer noise, whatever the ratio
+NOISE_FLOOR = 50e-6
+
+
+def synthetic_dataset(directory, subjects, seed=0):
+    """A dataset of `subjects` spectra: Lorentzian peaks at every metabolite shift over noise."""
+    rng = np.random.default_rng(seed)
+    shifts = np.loadtxt(CHEMICAL_SHIFTS_PATH, delimiter=",", dtype=np.float64).ravel()
+    spectra = rng.normal(0.0, 5e4, size=(len(shifts), subjects))
+    for shift in WeightedVisibilityGraph.metabolite_shift_values:
+        amplitudes = rng.lognormal(np.log(1e6), 0.6, size=subjects)
+        spectra += (1 / (1 + ((shifts - shift) / 0.15) ** 2))[:, None] * amplitudes[None, :]
+
+    # No CSV is written: the store holds the spectra directly
+    spectra_path = os.path.join(directory, f"synthetic_{subjects}.csv")
+    SpectrumStore(spectra_path, data=spectra)
+    return WeightedVisibilityGraph.Dataset(spectra_path, CHEMICAL_SHIFTS_PATH)
+
+
+class SyntheticDatasets:
+    """synthetic_dataset of every cohort size, written on first access; iterates over the sizes like a dict."""
+
+    def __init__(self, directory, sizes):
+        self.directory = directory
+        self.sizes = sorted(sizes)
+        self.built = {}
+
+    def __iter__(self):
+        return iter(self.sizes)
+
+    def __getitem__(self, size):
+        if size not in self.built:
+            self.built[size] = synthetic_dataset(self.directory, size)
+        return self.built[size]
+
+
+def random_walk(length, seed=0):
+    return np.cumsum(np.random.default_rng(seed).normal(size=length))
+
+
+def measure(function, repeat, calls=1, min_time=0.5, max_rounds=50):
+    """Best time per call; `function` performs `calls` calls per round.
+
+    Runs at least `repeat` rounds, and more (up to `max_rounds`) until `min_time`
+    seconds have been spent, with the garbage collector off as in timeit.
+    """
+    times = []
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while len(times) < repeat or (sum(times) * calls < min_time and len(times) < max_rounds):
+            start = time.perf_counter()
+            function()
+            times.append((time.perf_counter() - start) / calls)
+    finally:
+        if enabled:
+            gc.enable()
+    return min(times)
+
+
+def graph_benchmarks(datasets):
+    dataset = datasets[min(datasets)]
+    subjects = range(dataset.subject_count)
+    for graph_type in GRAPH_TYPES:
+        yield (f"graph.{graph_type}",
+               lambda: [WeightedVisibilityGraph.Graph(subject, graph_type, dataset=dataset) for subject in subjects],
+               len(subjects))
+
+
+def feature_benchmarks(datasets):
+    dataset = datasets[min(datasets)]
+    for graph_type in GRAPH_TYPES:
+        graphs = [WeightedVisibilityGraph.Graph(subject, graph_type, dataset=dataset)
+                  for subject in range(dataset.subject_count)]
+        yield f"features.{graph_type}", lambda: [graph.compute_graph_features() for graph in graphs], len(graphs)
+
+    graphs = [WeightedVisibilityGraph.Graph(subject, dataset=dataset, metrics_engine="bct")
+              for subject in range(dataset.subject_count)]
+    yield "features.bct.Complete Metabolite Graph", lambda: [graph.compute_graph_features() for graph in graphs], len(graphs)
+
+
+def series_benchmarks(datasets):
+    for length in SERIES_LENGTHS["hvg"]:
+        series = random_walk(length)
+        yield f"hvg.{length}", lambda: horizontal_visibility_edges(series), 1
+    for length in SERIES_LENGTHS["nvg"]:
+        series = random_walk(length)
+        yield f"nvg.{length}", lambda: natural_visibility_edges(series), 1
+
+
+def cohort_benchmarks(datasets):
+    for size in datasets:
+        dataset = datasets[size]
+        for graph_type in GRAPH_TYPES:
+            yield (f"cohort.{size}.{graph_type}",
+                   lambda: WeightedVisibilityGraph.build_cohort(graph_type=graph_type, dataset=dataset).features, size)
+
+
+def dynamic_benchmarks(datasets):
+    dataset = datasets[min(datasets)]
+    # A slowly recovering acquisition: the first subject's spectrum, scaled and with fresh noise per frame
+    spectrum = np.asarray(dataset.spectrum_store.column(0))
+    rng = np.random.default_rng(0)
+    recovery = 1 - 0.5 * np.exp(-np.arange(DYNAMIC_FRAMES) / 100)
+    frames = spectrum[:, None] * recovery + rng.normal(0.0, 5e4, size=(len(spectrum), DYNAMIC_FRAMES))
+    for graph_type in GRAPH_TYPES:
+        yield (f"dynamic.{DYNAMIC_FRAMES}.{graph_type}",
+               lambda: WeightedVisibilityGraph.build_series(frames, graph_type, window=4, dataset=dataset).features,
+               DYNAMIC_FRAMES)
+
+
+def preprocessing_benchmarks(datasets):
+    # The largest cohort up to 1k subjects, fitted without the dataset's cache
+    size = max((size for size in datasets if size <= 1000), default=min(datasets))
+    dataset = datasets[size]
+    spectra = np.asarray(dataset.spectra)
+    shifts = np.asarray(dataset.chemical_shifts_array)
+    for peaks in ("area", "lorentzian"):
+        preprocessing = SpectrumPreprocessing(baseline_order=3, smoothing_window=7, peaks=peaks)
+        yield (f"preprocess.{size}.{peaks}",
+               lambda: preprocessing.peak_intensities(spectra, shifts, dataset.metabolite_indices), size)
+
+
+def ui_benchmarks(datasets):
+    from matplotlib.backend_bases import MouseEvent
+    from PyQt5.QtWidgets import QApplication
+
+    WeightedVisibilityGraph.dataset = datasets[min(datasets)]
+    app = QApplication.instance() or QApplication([])
+    import MRSight
+    window = MRSight.MRSight()
+    window.resize(1600, 900)
+    window.show()
+    app.processEvents()
+    canvas = window.graph_widget.figure.canvas
+    canvas.draw()
+
+    def hover_points():
+        axes = window.graph_widget.axes
+        starts, ends, visible = window.edge_layers["primary"].segment_arrays()
+        graph = window.primary_graph
+        points = np.concatenate([(starts[visible] + ends[visible]) / 2,
+                                 np.column_stack((graph.node_shifts, graph.node_intensities))])
+        points = axes.transData.transform(points)
+        # Empty space between items, so consecutive events always change what is hovered
+        empty = axes.transAxes.transform([(0.02, 0.98)])[0]
+        return [point for item in points for point in (item, empty)]
+
+    events = [MouseEvent("motion_notify_event", canvas, x, y) for x, y in hover_points()]
+
+    def hover_cycle():
+        for event in events:
+            window.on_hover(event)
+
+    yield "ui.draw_graph", window.draw_graph, 1
+    yield "ui.render_graph", canvas.draw, 1
+    yield "ui.hover", hover_cycle, len(events)
+    window.close()
+
+
+# Every group with the prefixes of the benchmark names it yields
+GROUPS = [
+    (("graph.",), graph_benchmarks),
+    (("features.",), feature_benchmarks),
+    (("hvg.", "nvg."), series_benchmarks),
+    (("cohort.",), cohort_benchmarks),
+    (("dynamic.",), dynamic_benchmarks),
+    (("preprocess.",), preprocessing_benchmarks),
+    (("ui.",), ui_benchmarks),
+]
+
+
+def selected(prefixes, only):
+    """Whether --only can match any benchmark of a group whose names start with `prefixes`."""
+    return not only or any(name.startswith(wanted) or wanted.startswith(name) for name in prefixes for wanted in only)
+
+
+def machine():
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()}
+
+
+def compare(results, baseline, tolerance):
+    """Print every result against its baseline and return the names of the regressions."""
+    regressions = []
+    print(f"{'benchmark':<48}{'time':>12}{'baseline':>12}{'ratio':>8}")
+    for name, seconds in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:<48}{seconds * 1e3:>10.3f}ms{'-':>12}")
+            continue
+        ratio = seconds / previous
+        regressed = ratio > 1 + tolerance and seconds - previous > NOISE_FLOOR
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<48}{seconds * 1e3:>10.3f}ms{previous * 1e3:>10.3f}ms{ratio:>7.2f}x"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--only", nargs="+", default=None, help="benchmark name prefixes to run")
+    parser.add_argument("--cohorts", type=int, nargs="+", default=COHORT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            stored = json.load(file)
+        if stored.get("machine") == machine():
+            baseline = stored["results"]
+        else:
+            print(f"Not comparing: the baseline was recorded on {stored.get('machine')}, this is {machine()}",
+                  file=sys.stderr)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        datasets = SyntheticDatasets(directory, args.cohorts)
+        for prefixes, group in GROUPS:
+            if not selected(prefixes, args.only):
+                continue
+            for name, function, calls in group(datasets):
+                if args.only and not name.startswith(tuple(args.only)):
+                    continue
+                # Big cohorts take seconds per round; one round is enough to see a regression
+                repeat = args.repeat if calls < 1000 or not name.startswith("cohort.") else 1
+                function()
+                results[name] = measure(function, repeat, calls)
+
+    regressions = compare(results, baseline, args.tolerance)
+    if args.save:
+        merged = dict(baseline, **results)
+        with open(args.baseline, "w") as file:
+            json.dump({"machine": machine(), "results": merged}, file, indent=2, sort_keys=True)
+        print(f"Saved {len(results)} results to {args.baseline}")
+        return
+    if regressions:
+        print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
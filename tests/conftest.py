@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def repository_directory(monkeypatch):
+    """The dataset paths are relative to the repository, as when MRSight is started from it."""
+    monkeypatch.chdir(ROOT)
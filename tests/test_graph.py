@@ -0,0 +1,74 @@
+import threading
+
+import numpy as np
+import pytest
+
+import WeightedVisibilityGraph
+from WeightedVisibilityGraph import METABOLITE_FEATURES, SPECTRUM_ATTRIBUTES, Graph
+
+METABOLITE_GRAPH_TYPES = ["Complete Metabolite Graph", "Natural Visibility Graph", "Horizontal Visibility Graph"]
+FULL_SPECTRUM_GRAPH_TYPES = ["Full-Spectrum Natural Visibility Graph", "Full-Spectrum Horizontal Visibility Graph"]
+
+
+@pytest.mark.parametrize("graph_type", FULL_SPECTRUM_GRAPH_TYPES)
+def test_full_spectrum_graph_has_no_metabolite_state(graph_type):
+    graph = Graph(0, graph_type, ppm_window=(-5, 5))
+    assert graph.edges == []
+    assert graph.nodes == [] and graph.node_names == [] and graph.node_index == {}
+    assert graph.undirected_connection_matrix.shape == (0, 0)
+    assert all(getattr(graph, name) is None for name in METABOLITE_FEATURES)
+    assert graph.spectrum_adjacency.shape == (len(graph.spectrum_indices),) * 2
+    assert graph.average_degree > 0
+
+
+@pytest.mark.parametrize("metabolite_type", METABOLITE_GRAPH_TYPES)
+@pytest.mark.parametrize("graph_type", FULL_SPECTRUM_GRAPH_TYPES)
+def test_change_from_metabolite_to_full_spectrum_graph(metabolite_type, graph_type):
+    graph = Graph(0, metabolite_type)
+    assert graph.edges and graph.global_efficiency is not None
+
+    graph.change_graph_type(graph_type)
+    fresh = Graph(0, graph_type)
+    assert graph.edges == []
+    assert graph.node_names == [] and len(graph.node_intensities) == 0
+    assert graph.undirected_connection_matrix.shape == (0, 0)
+    assert all(getattr(graph, name) is None for name in METABOLITE_FEATURES)
+    for name in ("density", "average_degree", "average_strength", "average_clustering_coef"):
+        assert getattr(graph, name) == getattr(fresh, name)
+    np.testing.assert_array_equal(graph.spectrum_degrees, fresh.spectrum_degrees)
+
+
+@pytest.mark.parametrize("graph_type", FULL_SPECTRUM_GRAPH_TYPES)
+def test_change_from_full_spectrum_to_metabolite_graph(graph_type):
+    graph = Graph(0, graph_type)
+    graph.change_graph_type("Natural Visibility Graph")
+    fresh = Graph(0, "Natural Visibility Graph")
+    assert all(getattr(graph, name) is None for name in SPECTRUM_ATTRIBUTES)
+    assert graph.edges == fresh.edges
+    assert graph.node_names == fresh.node_names
+    assert graph.global_efficiency == fresh.global_efficiency
+    assert graph.density == fresh.density
+    assert len(graph.node_names) == len(WeightedVisibilityGraph.metabolite_symbols)
+
+
+def test_concurrent_builds_fill_the_dataset_once(monkeypatch):
+    from SpectrumPreprocessing import SpectrumPreprocessing
+
+    fills = []
+    peak_intensities = SpectrumPreprocessing.peak_intensities
+    monkeypatch.setattr(SpectrumPreprocessing, "peak_intensities",
+                        lambda self, *args: fills.append(args) or peak_intensities(self, *args))
+    dataset = WeightedVisibilityGraph.Dataset(preprocessing=SpectrumPreprocessing(baseline_order=3, peaks="area"))
+    barrier = threading.Barrier(8)
+    graphs = {}
+
+    def build(subject):
+        barrier.wait()
+        graphs[subject] = Graph(subject, "Natural Visibility Graph", dataset=dataset)
+
+    threads = [threading.Thread(target=build, args=(subject,)) for subject in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(fills) == 1 and len(graphs) == 8
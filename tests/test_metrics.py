@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import GraphMetrics
+from WeightedVisibilityGraph import Cohort, metabolite_symbols
+
+bct = pytest.importorskip("bct")
+
+GRAPH_TYPES = ["Complete Metabolite Graph", "Natural Visibility Graph", "Horizontal Visibility Graph"]
+SUBJECTS = 20
+
+
+def bct_metrics(W):
+    """The bct calls the vectorised metrics replace, as Graph.compute_bct_features makes them."""
+    # charpath divides by the zero entries of the matrix it is given
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "undirected_strengths": bct.strengths_und(W),
+            "undirected_betweenness_centralities": bct.betweenness_wei(W),
+            "undirected_clustering_coefs": bct.clustering_coef_wd(W),
+            "local_efficiency": bct.efficiency_wei(W, local=True),
+            "density": bct.density_und(W)[0],
+            "global_efficiency": bct.efficiency_wei(W),
+            "char_path_length": bct.charpath(W)[0],
+            "undirected_transitivity_wu": bct.transitivity_wu(W),
+        }
+
+
+def random_intensities(kind, seed):
+    """(subjects, metabolites) peaks: positive, with repeated values, or of both signs (negative ratio weights)."""
+    rng = np.random.default_rng(seed)
+    shape = (SUBJECTS, len(metabolite_symbols))
+    if kind == "positive":
+        return rng.lognormal(np.log(1e6), 1.0, size=shape)
+    if kind == "ties":
+        return rng.integers(1, 4, size=shape) * 1e6
+    return rng.choice([-1.0, 1.0], size=shape) * rng.lognormal(np.log(1e6), 1.0, size=shape)
+
+
+def assert_parity(actual, expected, label):
+    for name in GraphMetrics.METRIC_NAMES:
+        np.testing.assert_allclose(actual[name], expected[name], rtol=1e-9, atol=1e-12, equal_nan=True,
+                                   err_msg=f"{label} {name}")
+
+
+@pytest.mark.parametrize("kind", ["positive", "ties", "mixed signs"])
+@pytest.mark.parametrize("graph_type", GRAPH_TYPES)
+def test_metrics_match_bct(graph_type, kind):
+    matrices = Cohort(graph_type=graph_type, intensities=random_intensities(kind, GRAPH_TYPES.index(graph_type))
+                      ).connection_matrices
+    stacked = GraphMetrics.graph_metrics(matrices)
+    for subject, W in enumerate(matrices):
+        expected = bct_metrics(W)
+        assert_parity(GraphMetrics.graph_metrics(W), expected, f"{graph_type} {kind} subject {subject}")
+        assert_parity({name: value[subject] for name, value in stacked.items()}, expected,
+                      f"{graph_type} {kind} stacked subject {subject}")
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+import GraphStatistics
+
+
+@pytest.mark.parametrize("resamples", [0, -5])
+def test_no_resamples_is_rejected(resamples):
+    with pytest.raises(ValueError):
+        GraphStatistics.compare_subjects(0, 1, resamples=resamples, workers=1)
+
+
+def test_resamples_tied_with_the_observed_value_count():
+    observed = 0.1 + 0.2
+    # The same statistic reached through different rounding, on both sides
+    null = np.array([0.3, -0.3, observed * (1 - 1e-15), 0.1])
+    assert GraphStatistics.p_value(null, observed) == 4 / 5
+    assert GraphStatistics.p_value(null, -observed) == 4 / 5
+
+
+def test_p_values_do_not_depend_on_the_workers():
+    serial = GraphStatistics.compare_subjects(0, 1, resamples=600, seed=3, workers=1)
+    parallel = GraphStatistics.compare_subjects(0, 1, resamples=600, seed=3, workers=2)
+    assert serial == parallel